@@ -0,0 +1,216 @@
+"""
+Caching layer of the Notes API.
+
+A `NotesCache` stores values in the NOTES_CACHE cache of CACHES, which is shared by all processes, and
+keeps the most recently used ones in a bounded in-process LRU, so that they are read without a network
+round trip. The local copies may be stale for up to `local_timeout` seconds: values that must be seen
+by all processes as soon as they change, such as counters, use `local_timeout=0` or the `shared` methods.
+
+Keys are namespaced and hashed: "notes:<namespace>:<md5 of the key parts>". `None` results of
+`get_or_set` are cached for `negative_timeout` seconds. Concurrent computations of the same missing
+value are avoided with a short lock in the shared cache.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Marker of missing values, since None can be cached.
+MISSING = object()
+# Marker of cached None values.
+_NONE = "notes:none"
+# Interval between two checks of a value computed by another process, in seconds.
+_LOCK_POLL_INTERVAL = 0.05
+
+
+class LocalLRUCache:
+    """
+    Thread-safe, bounded LRU cache of a process, with expiration.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Return a value that did not expire, or `MISSING`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expiration = entry
+            if expiration <= time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        """
+        Store a value for `timeout` seconds, None for no expiration.
+        """
+        if self.max_size <= 0 or (timeout is not None and timeout <= 0):
+            return
+        expiration = float("inf") if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (value, expiration)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class NotesCache:
+    """
+    Two-tier cache of a kind of values: in-process LRU in front of the shared cache.
+
+    Timeouts are in seconds, None for no expiration, and may be callables, so that they can be read
+    from settings when used.
+    """
+
+    def __init__(
+        self, namespace, timeout, *, local_timeout=None, negative_timeout=None, lock_timeout=1, local_size=None
+    ):
+        self.namespace = namespace
+        self._timeout = timeout
+        self._local_timeout = local_timeout
+        self._negative_timeout = negative_timeout
+        self.lock_timeout = lock_timeout
+        self.local = LocalLRUCache(
+            local_size if local_size is not None else getattr(settings, "NOTES_LOCAL_CACHE_SIZE", 1000)
+        )
+
+    @property
+    def shared(self):
+        """
+        The shared Django cache.
+        """
+        return caches[getattr(settings, "NOTES_CACHE", "default")]
+
+    @property
+    def timeout(self):
+        return self._timeout() if callable(self._timeout) else self._timeout
+
+    @property
+    def local_timeout(self):
+        """
+        Timeout of local copies: the shared timeout by default.
+        """
+        local_timeout = self._local_timeout() if callable(self._local_timeout) else self._local_timeout
+        return self.timeout if local_timeout is None else local_timeout
+
+    @property
+    def negative_timeout(self):
+        """
+        Timeout of cached None values: the shared timeout by default.
+        """
+        negative_timeout = (
+            self._negative_timeout() if callable(self._negative_timeout) else self._negative_timeout
+        )
+        return self.timeout if negative_timeout is None else negative_timeout
+
+    def make_key(self, *parts):
+        """
+        Return the key of a value identified by `parts`, suitable for any cache backend.
+        """
+        digest = hashlib.md5("\n".join(str(part) for part in parts).encode()).hexdigest()
+        return f"notes:{self.namespace}:{digest}"
+
+    def get(self, key, default=None):
+        """
+        Return the value of a key made by `make_key`, or `default`.
+        """
+        value = self.local.get(key)
+        if value is MISSING:
+            value = self.shared.get(key, MISSING)
+            if value is MISSING:
+                return default
+            self.local.set(key, value, self._local_timeout_of(value))
+        return None if value == _NONE else value
+
+    def set(self, key, value, timeout=None):
+        """
+        Store a value in both tiers. None values are stored for the negative timeout.
+        """
+        if value is None:
+            value, timeout = _NONE, self.negative_timeout
+        elif timeout is None:
+            timeout = self.timeout
+        self.shared.set(key, value, timeout=timeout)
+        self.local.set(key, value, _min_timeout(timeout, self._local_timeout_of(value)))
+
+    def delete(self, key):
+        """
+        Delete a value from the shared cache and from the local cache of this process.
+        """
+        self.shared.delete(key)
+        self.local.delete(key)
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        Return the value of a key, or compute it, store it and return it.
+
+        If another process is computing it, wait up to `lock_timeout` seconds for its result.
+        """
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        lock_key = key + ":lock"
+        if not self.shared.add(lock_key, True, timeout=self.lock_timeout):
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(_LOCK_POLL_INTERVAL)
+                value = self.get(key, MISSING)
+                if value is not MISSING:
+                    return value
+            # The other process is too slow or failed: compute the value anyway.
+            value = compute()
+            self.set(key, value, timeout)
+            return value
+
+        try:
+            value = compute()
+            self.set(key, value, timeout)
+        finally:
+            self.shared.delete(lock_key)
+        return value
+
+    def clear_local(self):
+        """
+        Clear the local cache of this process.
+        """
+        self.local.clear()
+
+    def _local_timeout_of(self, value):
+        if value == _NONE:
+            return _min_timeout(self.local_timeout, self.negative_timeout)
+        return self.local_timeout
+
+
+def _min_timeout(timeout, other_timeout):
+    """
+    Return the shortest of two timeouts, where None is no expiration.
+    """
+    if timeout is None:
+        return other_timeout
+    if other_timeout is None:
+        return timeout
+    return min(timeout, other_timeout)
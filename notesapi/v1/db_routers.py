@@ -0,0 +1,100 @@
+"""
+Database routing of the Notes API.
+
+Reads of the GET endpoints can be served by read replicas of the "default" database. To enable
+them, define the replicas in DATABASES and list their aliases in DATABASE_READ_REPLICAS:
+
+    DATABASES = {"default": {...}, "replica": {...}}
+    DATABASE_READ_REPLICAS = ["replica"]
+
+Only the reads that run in `read_from_replica` go to a replica: everything else, including the reads
+of write requests such as the check of the maximum number of notes, stays on the primary.
+
+Replicas may lag behind the primary. When DATABASE_READ_YOUR_WRITES_SECONDS is set, the reads of a
+user go to the primary for that many seconds after each of their writes, which are recorded in the
+shared NOTES_CACHE. It must be shared by all processes (memcached, redis...) for this to be reliable.
+Reads that fill the response cache run in `read_from_primary`, so that stale data is never cached.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from notesapi.v1.caching import NotesCache
+
+# Alias of the database used by reads in `read_from_replica`, None to use the primary.
+_read_database = ContextVar("notes_read_database", default=None)
+
+
+def _read_your_writes_seconds():
+    if not getattr(settings, "DATABASE_READ_REPLICAS", None):
+        return 0
+    return getattr(settings, "DATABASE_READ_YOUR_WRITES_SECONDS", 0)
+
+
+# Users who wrote notes recently. Writes must be seen by all processes at once: there are no local copies.
+last_writes = NotesCache("last_write", timeout=_read_your_writes_seconds, local_timeout=0)
+
+
+def record_write(user_id):
+    """
+    Record that notes of a user were written, so that their next reads see them.
+    """
+    timeout = _read_your_writes_seconds()
+    if timeout:
+        last_writes.set(last_writes.make_key(user_id), True, timeout=timeout)
+
+
+@contextmanager
+def read_from_replica(user_id=None):
+    """
+    Run the reads of the block on a read replica, if any.
+
+    Reads stay on the primary if `user_id` wrote notes recently.
+    """
+    replicas = getattr(settings, "DATABASE_READ_REPLICAS", None)
+    if not replicas or (
+        user_id is not None and _read_your_writes_seconds() and last_writes.get(last_writes.make_key(user_id))
+    ):
+        yield
+        return
+
+    token = _read_database.set(random.choice(replicas))
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Run the reads of the block on the primary, even within `read_from_replica`.
+    """
+    token = _read_database.set(None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Route the reads of `read_from_replica` to read replicas, and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):  # pylint: disable=unused-argument
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints):  # pylint: disable=unused-argument
+        # Objects read from a replica must not be saved there.
+        return DEFAULT_DB_ALIAS
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):  # pylint: disable=unused-argument
+        # Replicas get their schema from the primary.
+        if db in getattr(settings, "DATABASE_READ_REPLICAS", []):
+            return False
+        return None
@@ -1,12 +1,14 @@
 import itertools
-import json
 import os
 import random
 import uuid
+from collections import Counter, defaultdict
 
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from notesapi.v1.models import Note
+from notesapi.v1 import membership, response_cache
+from notesapi.v1.models import Note, NoteCounter
 
 
 def extract_comma_separated_list(option, value, parser):
@@ -58,7 +60,17 @@ class Command(BaseCommand):
         # In production, there is a max SQL query size.  Batch the bulk inserts
         # such that we don't exceed this limit.
         for notes_chunk in grouper_it(note_iter(total_notes, notes_per_user, course_ids), batch_size):
-            Note.objects.bulk_create(notes_chunk)
+            notes_chunk = list(notes_chunk)
+            with transaction.atomic():
+                counts = Counter((note.user_id, note.course_id) for note in notes_chunk)
+                usage_ids = defaultdict(set)
+                for note in notes_chunk:
+                    usage_ids[note.user_id, note.course_id].add(note.usage_id)
+                for (user_id, course_id), count in counts.items():
+                    NoteCounter.increment(user_id, course_id, amount=count)
+                    membership.record_notes(user_id, course_id)
+                    response_cache.invalidate(user_id, course_id, usage_ids[user_id, course_id])
+                Note.objects.bulk_create(notes_chunk)
 
 
 def note_iter(total_notes, notes_per_user, course_ids):
@@ -103,8 +115,8 @@ def note_iter(total_notes, notes_per_user, course_ids):
             usage_id=uuid.uuid4().hex,
             quote='foo bar baz',
             text=' '.join(weighted_get_words([(10, 5), (25, 3), (100, 2)])),
-            ranges=json.dumps([{"start": "/div[1]/p[1]", "end": "/div[1]/p[1]", "startOffset": 0, "endOffset": 6}]),
-            tags=json.dumps(weighted_get_words([(1, 40), (2, 30), (5, 15), (10, 10), (15, 5)]))
+            ranges=[{"start": "/div[1]/p[1]", "end": "/div[1]/p[1]", "startOffset": 0, "endOffset": 6}],
+            tags=weighted_get_words([(1, 40), (2, 30), (5, 15), (10, 10), (15, 5)])
         )
 
 
@@ -0,0 +1,64 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from elasticsearch.exceptions import TransportError
+
+from notesapi.v1.search_indexes import outbox
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Index the notes of the Elasticsearch outbox in the background. Run a single worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            action='store',
+            type=int,
+            default=500,
+            help='number of outbox rows that should be processed with each bulk request'
+        )
+        parser.add_argument(
+            '--poll_interval',
+            action='store',
+            type=float,
+            default=1,
+            help='number of seconds to wait when the outbox is empty, and initial backoff after errors'
+        )
+        parser.add_argument(
+            '--max_backoff',
+            action='store',
+            type=float,
+            default=300,
+            help='maximum number of seconds to wait before retrying after errors'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='exit once the outbox is empty, or on the first Elasticsearch error'
+        )
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+        failures = 0
+        while True:
+            try:
+                processed = outbox.process_outbox(
+                    options['batch_size'], initial_backoff=poll_interval, max_backoff=options['max_backoff']
+                )
+            except TransportError as error:
+                if options['once']:
+                    raise CommandError(f'Elasticsearch is unavailable: {error}') from error
+                delay = min(poll_interval * 2 ** failures, options['max_backoff'])
+                failures += 1
+                log.warning('Elasticsearch is unavailable, retrying in %s seconds: %s', delay, error)
+                time.sleep(delay)
+                continue
+
+            failures = 0
+            if processed < options['batch_size']:
+                if options['once']:
+                    return
+                time.sleep(poll_interval)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from notesapi.v1 import membership
+from notesapi.v1.models import Note
+
+
+class Command(BaseCommand):
+    help = 'Record in the membership cache the users who have notes, such as notes inserted without the API'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course_ids',
+            nargs='+',
+            help='ids of the courses whose members should be recorded (default: all courses)'
+        )
+        parser.add_argument(
+            '--batch_size',
+            action='store',
+            type=int,
+            default=1000,
+            help='number of members that should be recorded at a time'
+        )
+
+    def handle(self, *args, **options):
+        if not membership.is_enabled():
+            self.stderr.write('The membership cache is disabled: set NOTES_MEMBERSHIP_CACHE_TIMEOUT.')
+            return
+
+        notes = Note.objects.all()
+        if options['course_ids']:
+            notes = notes.filter(course_id__in=options['course_ids'])
+
+        members = notes.values_list('user_id', 'course_id').distinct().order_by().iterator()
+        total = 0
+        batch = {}
+        for user_id, course_id in members:
+            batch[membership.memberships.make_key(user_id, course_id)] = True
+            if len(batch) >= options['batch_size']:
+                total += self._record(batch)
+        total += self._record(batch)
+        self.stdout.write(f'Recorded {total} users with notes.')
+
+    def _record(self, batch):
+        """
+        Record a batch of members and empty it.
+        """
+        membership.memberships.shared.set_many(batch, timeout=membership.memberships.timeout)
+        count = len(batch)
+        batch.clear()
+        return count
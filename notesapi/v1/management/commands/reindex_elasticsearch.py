@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notesapi.v1.search_indexes import reindex
+
+
+class Command(BaseCommand):
+    help = 'Re-index all notes in a new Elasticsearch index, then point the notes index alias to it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            action='store',
+            type=int,
+            default=1000,
+            help='number of notes that should be indexed with each bulk request'
+        )
+        parser.add_argument(
+            '--workers',
+            action='store',
+            type=int,
+            default=4,
+            help='number of bulk requests that should be sent in parallel'
+        )
+        parser.add_argument(
+            '--delete_previous',
+            action='store_true',
+            help='delete the indices the alias pointed to once it is swapped'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def on_progress(count):
+            rate = count / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'Indexed {count} notes ({rate:.0f} notes/s).')
+
+        name, count, deleted = reindex.rebuild_index(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            delete_previous=options['delete_previous'],
+            on_progress=on_progress,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Re-indexed {count} notes in {name} in {elapsed:.1f}s ({count / max(elapsed, 1e-6):.0f} notes/s), '
+            f'and pointed {reindex.ALIAS} to it. Deleted {deleted} documents of notes deleted in the meantime.'
+        )
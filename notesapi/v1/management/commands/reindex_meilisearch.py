@@ -0,0 +1,70 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from notesapi.v1.views.meilisearch import reindex
+
+
+class Command(BaseCommand):
+    help = 'Re-index all notes in Meilisearch, by ranges of ids, resuming from a checkpoint file if any'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            action='store',
+            type=int,
+            default=5000,
+            help='number of note ids that should be indexed in a single request'
+        )
+        parser.add_argument(
+            '--workers',
+            action='store',
+            type=int,
+            default=4,
+            help='number of requests that should be sent in parallel'
+        )
+        parser.add_argument(
+            '--checkpoint_file',
+            action='store',
+            help='file where progress should be saved, and from which it should be resumed'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='ignore the checkpoint file and re-index all notes'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint_file = options['checkpoint_file']
+        after_id = 0
+        if checkpoint_file and not options['restart'] and os.path.exists(checkpoint_file):
+            with open(checkpoint_file, encoding='utf-8') as f:
+                after_id = json.load(f)['last_id']
+            self.stdout.write(f'Resuming after note {after_id}.')
+
+        started = time.monotonic()
+
+        def on_progress(count, last_id):
+            if checkpoint_file:
+                self._save_checkpoint(checkpoint_file, last_id)
+            rate = count / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'Indexed {count} notes, up to note {last_id} ({rate:.0f} notes/s).')
+
+        total = reindex(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            after_id=after_id,
+            on_progress=on_progress,
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'Re-indexed {total} notes in {elapsed:.1f}s ({total / max(elapsed, 1e-6):.0f} notes/s).')
+
+    def _save_checkpoint(self, checkpoint_file, last_id):
+        """
+        Replace the checkpoint file atomically, so that an interrupted run never leaves it truncated.
+        """
+        with open(f'{checkpoint_file}.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'last_id': last_id}, f)
+        os.replace(f'{checkpoint_file}.tmp', checkpoint_file)
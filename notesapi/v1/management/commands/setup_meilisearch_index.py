@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from notesapi.v1.views.meilisearch import Client
+
+
+class Command(BaseCommand):
+    help = 'Create the Meilisearch index of the notes if it does not exist, and update its filterable attributes'
+
+    def handle(self, *args, **options):
+        index = Client().setup_index()
+        self.stdout.write(f'Meilisearch index "{index.uid}" is ready.')
@@ -0,0 +1,50 @@
+import time
+from datetime import timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from notesapi.v1.views import get_annotation_search_view_class
+
+
+class Command(BaseCommand):
+    help = (
+        'Index in the active search backend the notes updated since a date, and remove its documents of '
+        'notes that no longer exist, such as after an outage of the backend'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            action='store',
+            required=True,
+            help='date from which notes should be synchronized, such as "2026-10-18T09:30:00Z" (default: UTC)'
+        )
+        parser.add_argument(
+            '--batch_size',
+            action='store',
+            type=int,
+            default=1000,
+            help='number of notes that should be indexed or deleted with each request'
+        )
+
+    def handle(self, *args, **options):
+        since = parse_datetime(options['since'])
+        if since is None:
+            raise CommandError(f'Invalid date: {options["since"]}')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, dt_timezone.utc)
+
+        started = time.monotonic()
+
+        def on_progress(indexed, deleted):
+            rate = (indexed + deleted) / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(f'Indexed {indexed} notes, deleted {deleted} notes ({rate:.0f} notes/s).')
+
+        view_class = get_annotation_search_view_class()
+        indexed, deleted = view_class.sync_notes(since, batch_size=options['batch_size'], on_progress=on_progress)
+        self.stdout.write(
+            f'Synchronized the notes updated since {since.isoformat()} in {time.monotonic() - started:.1f}s: '
+            f'{indexed} indexed, {deleted} deleted.'
+        )
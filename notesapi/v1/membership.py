@@ -0,0 +1,63 @@
+"""
+Cache of the users who have notes in a course.
+
+Most learners never create notes, but their notes are requested on every unit view. Whether a user has
+notes in a course is cached in the shared NOTES_CACHE for NOTES_MEMBERSHIP_CACHE_TIMEOUT seconds, 0 to
+disable it, so that the requests of users without notes return empty results without querying them.
+
+Only the absence of notes saves queries, so the cache must never miss a created note:
+
+* Writes only record that users have notes, before and after their transaction is committed.
+* Reads only record that users have no notes if nothing was recorded in the meantime.
+
+Deleted notes are not recorded: users who deleted all their notes are only queried again. Notes inserted
+without the API must be recorded with the `record_notes_membership` management command.
+"""
+
+from django.conf import settings
+from django.db import transaction
+
+from notesapi.v1.caching import MISSING, NotesCache
+from notesapi.v1.models import Note
+
+# Changes must be seen by all processes at once: there are no local copies.
+memberships = NotesCache("membership", timeout=lambda: settings.NOTES_MEMBERSHIP_CACHE_TIMEOUT, local_timeout=0)
+
+
+def is_enabled():
+    """
+    Return whether memberships are cached.
+    """
+    return bool(getattr(settings, "NOTES_MEMBERSHIP_CACHE_TIMEOUT", 0))
+
+
+def has_notes(user_id, course_id):
+    """
+    Return False if a user has no notes in a course, True if they may have some.
+    """
+    if not is_enabled():
+        return True
+
+    key = memberships.make_key(user_id, course_id)
+    member = memberships.get(key, MISSING)
+    if member is MISSING:
+        member = Note.objects.filter(user_id=user_id, course_id=course_id).exists()
+        # A note created since the query was recorded: keep it.
+        memberships.shared.add(key, member, timeout=memberships.timeout)
+    return member
+
+
+def record_notes(user_id, course_id):
+    """
+    Record that a user has notes in a course.
+
+    When called in a transaction, this happens again once it is committed, so that a concurrent read of
+    the uncommitted notes cannot record that the user has none.
+    """
+    if not is_enabled():
+        return
+
+    key = memberships.make_key(user_id, course_id)
+    memberships.set(key, True)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: memberships.set(key, True))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1', '0003_auto_20200703_1515'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user_id', 'course_id', 'updated'], name='note_user_course_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+""" Add JSON columns that will replace the JSON-encoded ranges and tags text columns """
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """ Add JSON columns that will replace the JSON-encoded ranges and tags text columns """
+
+    dependencies = [
+        ('v1', '0004_note_user_course_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='ranges_json',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='note',
+            name='tags_json',
+            field=models.JSONField(null=True),
+        ),
+    ]
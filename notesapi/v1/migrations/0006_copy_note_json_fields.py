@@ -0,0 +1,73 @@
+""" Copy the JSON-encoded ranges and tags of every note into the new JSON columns """
+
+import json
+import logging
+
+from django.db import migrations
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _loads(value):
+    """
+    Decode a JSON-encoded text column, falling back to an empty list on corrupted data.
+    """
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        log.warning("Corrupted JSON data replaced by an empty list: %r", value)
+        return []
+
+
+def _iter_batches(queryset):
+    """
+    Yield batches of notes in primary key order, without OFFSET scans.
+    """
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1].pk
+
+
+def copy_to_json_fields(apps, schema_editor):
+    """
+    Decode ranges and tags into the JSON columns.
+    """
+    Note = apps.get_model('v1', 'Note')
+    for notes in _iter_batches(Note.objects.only('pk', 'ranges', 'tags')):
+        for note in notes:
+            note.ranges_json = _loads(note.ranges)
+            note.tags_json = _loads(note.tags)
+        Note.objects.bulk_update(notes, ['ranges_json', 'tags_json'])
+
+
+def copy_from_json_fields(apps, schema_editor):
+    """
+    Encode the JSON columns back into ranges and tags.
+    """
+    Note = apps.get_model('v1', 'Note')
+    for notes in _iter_batches(Note.objects.only('pk', 'ranges_json', 'tags_json')):
+        for note in notes:
+            note.ranges = json.dumps(note.ranges_json)
+            note.tags = json.dumps(note.tags_json or [], ensure_ascii=False)
+        Note.objects.bulk_update(notes, ['ranges', 'tags'])
+
+
+class Migration(migrations.Migration):
+    """ Copy the JSON-encoded ranges and tags of every note into the new JSON columns """
+
+    # Each batch is committed on its own so that large tables are not locked for the whole copy.
+    atomic = False
+
+    dependencies = [
+        ('v1', '0005_note_json_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_to_json_fields, copy_from_json_fields),
+    ]
@@ -0,0 +1,49 @@
+""" Replace the JSON-encoded ranges and tags text columns by the JSON columns """
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """ Replace the JSON-encoded ranges and tags text columns by the JSON columns """
+
+    dependencies = [
+        ('v1', '0006_copy_note_json_fields'),
+    ]
+
+    operations = [
+        # A default lets this migration be reversed on a populated table: the text column is
+        # re-added with it, then filled by the reverse of the previous data migration.
+        migrations.AlterField(
+            model_name='note',
+            name='ranges',
+            field=models.TextField(default='[]', help_text='JSON, describes position of quote in the source text'),
+        ),
+        migrations.RemoveField(
+            model_name='note',
+            name='ranges',
+        ),
+        migrations.RemoveField(
+            model_name='note',
+            name='tags',
+        ),
+        migrations.RenameField(
+            model_name='note',
+            old_name='ranges_json',
+            new_name='ranges',
+        ),
+        migrations.RenameField(
+            model_name='note',
+            old_name='tags_json',
+            new_name='tags',
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='ranges',
+            field=models.JSONField(help_text='Describes position of quote in the source text'),
+        ),
+        migrations.AlterField(
+            model_name='note',
+            name='tags',
+            field=models.JSONField(blank=True, default=list, help_text='List of comma-separated tags'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1', '0007_replace_note_text_fields_with_json'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.CharField(help_text='Anonymized user id, not course specific', max_length=255)),
+                ('course_id', models.CharField(max_length=255)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('user_id', 'course_id'), name='note_counter_user_course_uniq'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('v1', '0008_notecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteIndexOutbox',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_id', models.IntegerField(db_index=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -1,7 +1,7 @@
-import json
-
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
 
 
 class Note(models.Model):
@@ -17,10 +17,19 @@ class Note(models.Model):
     usage_id = models.CharField(max_length=255, help_text="ID of XBlock where the text comes from")
     quote = models.TextField(default="")
     text = models.TextField(default="", blank=True, help_text="Student's thoughts on the quote")
-    ranges = models.TextField(help_text="JSON, describes position of quote in the source text")
+    ranges = models.JSONField(help_text="Describes position of quote in the source text")
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
-    tags = models.TextField(help_text="JSON, list of comma-separated tags", default="[]")
+    tags = models.JSONField(help_text="List of comma-separated tags", default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # Covers the (user, course) filter and the "-updated" ordering used by the
+            # list and search views, so that pages are read in index order without a filesort.
+            models.Index(fields=["user_id", "course_id", "updated"], name="note_user_course_updated_idx"),
+            # Finds the notes updated since a date, to synchronize the search index.
+            models.Index(fields=["updated"], name="note_updated_idx"),
+        ]
 
     @classmethod
     def create(cls, note_dict):
@@ -38,8 +47,84 @@ class Note(models.Model):
         if len(ranges) < 1:
             raise ValidationError('Note must contain at least one range.')
 
-        note_dict['ranges'] = json.dumps(ranges)
         note_dict['user_id'] = note_dict.pop('user', None)
-        note_dict['tags'] = json.dumps(note_dict.get('tags', []), ensure_ascii=False)
 
         return cls(**note_dict)
+
+
+class NoteCounter(models.Model):
+    """
+    Number of notes of a user in a course.
+
+    It is updated in the same transaction as the notes, so that the per-course limit is
+    enforced by a single conditional increment instead of counting the notes.
+
+    .. pii:: Stores the anonymized user id.
+    .. pii_types:: id
+    .. pii_retirement:: local_api
+    """
+    user_id = models.CharField(max_length=255, help_text="Anonymized user id, not course specific")
+    course_id = models.CharField(max_length=255)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "course_id"], name="note_counter_user_course_uniq"),
+        ]
+
+    @classmethod
+    def increment(cls, user_id, course_id, amount=1, limit=None):
+        """
+        Add `amount` notes to the counter, unless the result would exceed `limit`.
+
+        Missing counters are initialized from the existing notes, so this must be called
+        before the new notes are saved, in the same transaction.
+
+        Returns the new number of notes, or None if the counter was not incremented. It is read
+        from the counter row, which the increment keeps locked until the end of the transaction.
+        """
+        counter = cls.objects.filter(user_id=user_id, course_id=course_id)
+        counters = counter if limit is None else counter.filter(count__lte=limit - amount)
+        if counters.update(count=F("count") + amount):
+            return counter.values_list("count", flat=True).get()
+
+        # Either the limit is reached or the counter does not exist yet: only count the notes in the latter case.
+        if limit is not None and counter.exists():
+            return None
+        count = Note.objects.filter(user_id=user_id, course_id=course_id).count()
+        try:
+            # In a savepoint, so that the transaction can go on if the counter was created concurrently.
+            # The unique constraint makes the insert wait for the transaction that created it, and its
+            # notes are then counted in it. With the READ COMMITTED isolation that Django uses on MySQL,
+            # the update above takes no gap lock that concurrent inserts could deadlock on.
+            with transaction.atomic():
+                cls.objects.create(user_id=user_id, course_id=course_id, count=count)
+        except IntegrityError:
+            pass
+        if not counters.update(count=F("count") + amount):
+            return None
+        return counter.values_list("count", flat=True).get()
+
+    @classmethod
+    def decrement(cls, user_id, course_id, amount=1):
+        """
+        Remove `amount` notes from the counter, without going below zero.
+        """
+        cls.objects.filter(user_id=user_id, course_id=course_id).update(
+            count=Case(When(count__gt=amount, then=F("count") - amount), default=0)
+        )
+
+
+class NoteIndexOutbox(models.Model):
+    """
+    Note whose document must be updated in the Elasticsearch index.
+
+    Rows are written in the transaction that changes the note by `OutboxSignalProcessor`, and deleted
+    by the `process_index_outbox` command once the document is indexed, or deleted if the note no
+    longer exists. Failed rows are retried after `next_attempt`.
+
+    It has no PII: its annotation is in .annotation_safe_list.yml.
+    """
+    note_id = models.IntegerField(db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
@@ -2,12 +2,233 @@
 Paginator for Notes where storage is mysql database.
 """
 
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
 
+from . import response_cache
+from .db_routers import read_from_primary
+from .serializers import ROW_ID_INDEX, ROW_UPDATED_INDEX
 from .utils import NotesPaginatorMixin
 
 
+class CachedCountPage(Page):
+    """
+    Page of a `CachedCountPaginator` that did not count the notes.
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Django paginator that caches the number of notes with `count_key` in `response_cache.counts`.
+
+    When `counted` is False, pages are fetched without counting the notes: one more note is fetched to
+    find out whether there is a next page.
+    """
+
+    def __init__(self, object_list, per_page, *, count_key=None, counted=True, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.counted = counted
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+
+        count = response_cache.counts.get(self.count_key)
+        if count is None:
+            with read_from_primary():
+                count = super().count
+            response_cache.counts.set(self.count_key, count)
+        return count
+
+    def page(self, number):
+        if self.counted:
+            return super().page(number)
+
+        try:
+            number = int(number)
+        except (TypeError, ValueError) as e:
+            raise PageNotAnInteger(self.error_messages["invalid_page"]) from e
+        if number < 1:
+            raise EmptyPage(self.error_messages["min_page"])
+
+        bottom = (number - 1) * self.per_page
+        notes = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not notes and number > 1:
+            raise EmptyPage(self.error_messages["no_results"])
+        return CachedCountPage(notes[:self.per_page], number, self, has_next=len(notes) > self.per_page)
+
+
 class NotesPaginator(NotesPaginatorMixin, pagination.PageNumberPagination):
     """
     Student Notes Paginator.
+
+    The number of notes of a user in a course is cached until their notes change, so that it is counted
+    once for all the pages. It is not counted at all with count=false.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginate a queryset, like `PageNumberPagination` does without the pagination controls of the
+        browsable API, which is not enabled: they need the number of pages.
+        """
+        # pylint: disable=attribute-defined-outside-init
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc))) from exc
+        return list(self.page)
+
+    def django_paginator_class(self, object_list, per_page):
+        """
+        Return the Django paginator of `object_list`.
+        """
+        return CachedCountPaginator(
+            object_list,
+            per_page,
+            count_key=self.get_count_key(object_list),
+            counted=self.is_count_requested(self.request),
+        )
+
+    def get_count_key(self, queryset):
+        """
+        Return the key of the number of notes of `queryset` in the count cache, or None if it is not cached.
+
+        Only the numbers of notes of a user in a course are cached, since they are invalidated with the
+        versions of their notes.
+        """
+        user_id = self.request.query_params.get("user")
+        course_id = self.request.query_params.get("course_id")
+        if not user_id or not course_id or not response_cache.is_count_enabled():
+            return None
+        try:
+            query = str(queryset.query)
+        except EmptyResultSet:
+            return None
+        return response_cache.count_key(user_id, course_id, query)
+
+
+class NotesCursorPaginator(pagination.CursorPagination):
+    """
+    Student Notes keyset Paginator.
+
+    Pages are delimited by the (updated, id) position of the notes at their boundaries, so
+    that fetching a page needs neither an OFFSET scan nor a COUNT(*), however deep it is.
+    The response only contains the `next`, `previous` and `rows` fields.
     """
+
+    page_size = settings.DEFAULT_NOTES_PAGE_SIZE
+    page_size_query_param = "page_size"
+    ordering = ("-updated", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # pylint: disable=attribute-defined-outside-init
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request) or pagination.Cursor(offset=0, reverse=False, position=None)
+
+        if self.cursor.position is not None:
+            updated, pk = self._decode_position(self.cursor.position)
+            if self.cursor.reverse:
+                queryset = queryset.filter(Q(updated__gt=updated) | Q(updated=updated, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(updated__lt=updated) | Q(updated=updated, id__lt=pk))
+
+        ordering = ("updated", "id") if self.cursor.reverse else self.ordering
+        results = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.cursor.reverse:
+            self.page.reverse()
+            self.has_next = self.cursor.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor.position is not None
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(pagination.Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(pagination.Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        """
+        Encode the (updated, id) position of a note.
+        """
+        if isinstance(instance, tuple):
+            updated, pk = instance[ROW_UPDATED_INDEX], instance[ROW_ID_INDEX]
+        elif isinstance(instance, dict):
+            updated, pk = instance["updated"], instance["id"]
+        else:
+            updated, pk = instance.updated, instance.pk
+        return f"{updated.isoformat()} {pk}"
+
+    def _decode_position(self, position):
+        """
+        Decode an (updated, id) position, as encoded by `_get_position_from_instance`.
+        """
+        try:
+            updated, pk = position.split(" ")
+            updated, pk = parse_datetime(updated), int(pk)
+        except ValueError as e:
+            raise NotFound(self.invalid_cursor_message) from e
+        if updated is None:
+            raise NotFound(self.invalid_cursor_message)
+        return updated, pk
+
+    def get_paginated_response(self, data):
+        """
+        Annotate the response with pagination links.
+        """
+        return Response(
+            {
+                'next': self.get_next_link(),
+                'previous': self.get_previous_link(),
+                'rows': data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['required'] = ['rows']
+        response_schema['properties']['rows'] = response_schema['properties'].pop('results')
+        return response_schema
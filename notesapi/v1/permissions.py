@@ -1,10 +1,15 @@
+import hashlib
 import logging
+import time
 
 import jwt
 from django.conf import settings
+from edx_django_utils.monitoring import set_custom_attribute
 from rest_framework.permissions import BasePermission
 from rest_framework_jwt.settings import api_settings
 
+from notesapi.v1.caching import MISSING, LocalLRUCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,6 +17,57 @@ class TokenWrongIssuer(Exception):
     pass
 
 
+class ValidatedTokenCache:
+    """
+    Bounded LRU cache of the users of tokens that were validated, until they expire.
+
+    Tokens are identified by a hash that includes the secret and the audience they were validated with.
+    The numbers of hits and misses are kept for monitoring.
+    """
+
+    def __init__(self, max_size):
+        self.hits = 0
+        self.misses = 0
+        self._users = LocalLRUCache(max_size)
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(
+            "\0".join((settings.CLIENT_SECRET, settings.CLIENT_ID, token)).encode()
+        ).digest()
+
+    def get(self, key):
+        """
+        Return the user of a token that is still valid, or None.
+        """
+        user = self._users.get(key)
+        if user is MISSING:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return user
+
+    def set(self, key, user, expiration):
+        """
+        Store the user of a token, until its expiration timestamp.
+        """
+        self._users.set(key, user, expiration - time.time())
+
+    def clear(self):
+        self._users.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Return the counters of the cache, for monitoring.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._users)}
+
+
+validated_tokens = ValidatedTokenCache(getattr(settings, "VALIDATED_TOKEN_CACHE_SIZE", 1024))
+
+
 class HasAccessToken(BasePermission):
     """
     Allow requests having valid ID Token.
@@ -38,17 +94,24 @@ class HasAccessToken(BasePermission):
             logger.debug("No token found in headers")
             return False
         try:
-            # TODO: Determine how and if we could remove `jwt.decode` from being called directly from this
-            #   service. Instead, use `jwt_decode_handler` or other library code that is used in other services.
-            #   It would be useful to simplify authentication within the platform, especially during upgrades of
-            #   authentication related dependencies.
-            data = jwt.decode(
-                token,
-                settings.CLIENT_SECRET,
-                algorithms=[api_settings.JWT_ALGORITHM],
-                audience=settings.CLIENT_ID
-            )
-            auth_user = data['sub']
+            token_key = validated_tokens.key(token)
+            auth_user = validated_tokens.get(token_key)
+            set_custom_attribute("notes.token_cache_hit", auth_user is not None)
+            if auth_user is None:
+                # TODO: Determine how and if we could remove `jwt.decode` from being called directly from this
+                #   service. Instead, use `jwt_decode_handler` or other library code that is used in other
+                #   services. It would be useful to simplify authentication within the platform, especially during
+                #   upgrades of authentication related dependencies.
+                data = jwt.decode(
+                    token,
+                    settings.CLIENT_SECRET,
+                    algorithms=[api_settings.JWT_ALGORITHM],
+                    audience=settings.CLIENT_ID
+                )
+                auth_user = data['sub']
+                # Tokens without expiration are validated every time.
+                if isinstance(data.get('exp'), (int, float)):
+                    validated_tokens.set(token_key, auth_user, data['exp'])
             user_found = False
             for request_field in ('GET', 'POST', 'data'):
                 if 'user' in getattr(request, request_field):
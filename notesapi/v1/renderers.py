@@ -0,0 +1,111 @@
+"""
+Renderers for Notes API.
+"""
+
+import json
+
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+
+
+class RawJSON:
+    """
+    A JSON document that is already encoded, such as a JSON column read as text.
+
+    `NotesJSONRenderer` writes it to the response as-is, without decoding it.
+    """
+    __slots__ = ("json",)
+
+    def __init__(self, json_text):
+        self.json = json_text
+
+    def __repr__(self):
+        return f"RawJSON({self.json!r})"
+
+    def loads(self):
+        """
+        Return the decoded JSON document.
+        """
+        return json.loads(self.json)
+
+
+class NotesJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that splices `RawJSON` fragments into the output.
+
+    Values that are not `RawJSON` are rendered exactly like `JSONRenderer` does. Consecutive
+    plain values of a dict are encoded together, so that a note with raw ranges and tags costs
+    two `json.dumps` calls.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into JSON, returning a bytestring.
+        """
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            # Pretty printing is only meant for humans: decode the fragments and let them be re-indented.
+            return super().render(_decode_raw_json(data), accepted_media_type, renderer_context)
+
+        ret = self._encode(data)
+        # See JSONRenderer.render
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
+
+    @property
+    def separators(self):
+        """
+        Item and key separators, as used by `JSONRenderer` without indentation.
+        """
+        return SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+
+    def _dumps(self, data):
+        """
+        Encode data that does not contain any `RawJSON`, with the options of `JSONRenderer`.
+        """
+        return json.dumps(
+            data, cls=self.encoder_class,
+            ensure_ascii=self.ensure_ascii, allow_nan=not self.strict, separators=self.separators,
+        )
+
+    def _encode(self, data):
+        """
+        Encode data that may contain `RawJSON` values, in dicts and lists.
+        """
+        item_separator, key_separator = self.separators
+        if isinstance(data, RawJSON):
+            return data.json
+        if isinstance(data, (list, tuple)):
+            return '[' + item_separator.join(self._encode(item) for item in data) + ']'
+        if not isinstance(data, dict):
+            return self._dumps(data)
+
+        parts = []
+        plain = {}
+        for key, value in data.items():
+            if isinstance(value, (RawJSON, list, tuple, dict)):
+                if plain:
+                    parts.append(self._dumps(plain)[1:-1])
+                    plain = {}
+                parts.append(self._dumps(key) + key_separator + self._encode(value))
+            else:
+                plain[key] = value
+        if plain:
+            parts.append(self._dumps(plain)[1:-1])
+        return '{' + item_separator.join(parts) + '}'
+
+
+def _decode_raw_json(data):
+    """
+    Return a copy of `data` where `RawJSON` values are decoded.
+    """
+    if isinstance(data, RawJSON):
+        return data.loads()
+    if isinstance(data, (list, tuple)):
+        return [_decode_raw_json(item) for item in data]
+    if isinstance(data, dict):
+        return {key: _decode_raw_json(value) for key, value in data.items()}
+    return data
@@ -0,0 +1,187 @@
+"""
+Cache of the responses of the annotation list and search endpoints.
+
+Responses are cached with `NotesCache`, in two caches:
+
+* `responses`: lists and searches per user, course and query parameters, for
+  NOTES_RESPONSE_CACHE_TIMEOUT seconds.
+* `usage_searches`: searches of the notes of a user in some usage ids of a course, which are the most
+  frequent requests, for NOTES_USAGE_SEARCH_CACHE_TIMEOUT seconds. They are stored as rendered JSON.
+
+The numbers of notes of paginated responses are cached in `counts` for NOTES_COUNT_CACHE_TIMEOUT
+seconds, so that the pages of a list share them.
+
+Each cache is disabled when its timeout is 0.
+
+Instead of deleting cached responses when notes change, their keys include version numbers, one per
+user, one per (user, course) and one per (user, course, usage id), which are bumped when notes are
+written. Cached responses of previous versions are never read again and expire on their own, so they
+can be kept in the local tier. Versions are only kept in the shared cache, which must be shared by all
+processes (memcached, redis...): a local-memory cache is only suitable for a single process.
+
+Cached data is read from the primary database: read replicas may lag behind the versions, and data
+older than its version would be served until it expires.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from notesapi.v1.caching import NotesCache
+from notesapi.v1.db_routers import read_from_primary
+
+responses = NotesCache("response", timeout=lambda: settings.NOTES_RESPONSE_CACHE_TIMEOUT)
+usage_searches = NotesCache("usage_search", timeout=lambda: settings.NOTES_USAGE_SEARCH_CACHE_TIMEOUT)
+counts = NotesCache("count", timeout=lambda: settings.NOTES_COUNT_CACHE_TIMEOUT)
+versions = NotesCache("version", timeout=None, local_timeout=0)
+
+
+def is_enabled():
+    """
+    Return whether responses are cached.
+    """
+    return bool(getattr(settings, "NOTES_RESPONSE_CACHE_TIMEOUT", 0))
+
+
+def is_usage_search_enabled():
+    """
+    Return whether usage id searches are cached.
+    """
+    return bool(getattr(settings, "NOTES_USAGE_SEARCH_CACHE_TIMEOUT", 0))
+
+
+def is_count_enabled():
+    """
+    Return whether the numbers of notes of paginated responses are cached.
+    """
+    return bool(getattr(settings, "NOTES_COUNT_CACHE_TIMEOUT", 0))
+
+
+def _user_version_key(user_id):
+    return versions.make_key("user", user_id)
+
+
+def _course_version_key(user_id, course_id):
+    return versions.make_key("course", user_id, course_id)
+
+
+def _usage_version_key(user_id, course_id, usage_id):
+    return versions.make_key("usage", user_id, course_id, usage_id)
+
+
+def _new_version():
+    # Versions that were evicted from the cache must not restart from a value used before.
+    return time.time_ns()
+
+
+def _get_versions(keys):
+    """
+    Return the current versions of some version keys.
+    """
+    cache = versions.shared
+    current = cache.get_many(keys)
+    for key in keys:
+        if key not in current:
+            cache.add(key, _new_version(), timeout=None)
+            current[key] = cache.get(key)
+    return [current[key] for key in keys]
+
+
+def _bump_version(key):
+    cache = versions.shared
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def _request_key_parts(request):
+    return (
+        # Paginated data has absolute links: responses are cached per host.
+        request.build_absolute_uri(request.path),
+        sorted(request.query_params.lists()),
+    )
+
+
+def response_key(request, user_id, course_id):
+    """
+    Return the key of the response data of `request` in `responses`, or None if it is disabled.
+    """
+    if not is_enabled():
+        return None
+
+    # The versions are read first, so that data read before a write is never cached with its version.
+    current_versions = _get_versions([_user_version_key(user_id), _course_version_key(user_id, course_id)])
+    return responses.make_key(user_id, course_id, *current_versions, *_request_key_parts(request))
+
+
+def usage_search_key(request, user_id, course_id, usage_ids):
+    """
+    Return the key of the response of a usage id search in `usage_searches`, or None if it is disabled.
+
+    It only changes when notes of these usage ids are written.
+    """
+    if not is_usage_search_enabled():
+        return None
+
+    usage_keys = [_usage_version_key(user_id, course_id, usage_id) for usage_id in sorted(set(usage_ids))]
+    current_versions = _get_versions([_user_version_key(user_id), *usage_keys])
+    # Responses are rendered: they depend on the negotiated media type, which may ask for indentation.
+    return usage_searches.make_key(
+        user_id, course_id, *current_versions, *_request_key_parts(request), request.accepted_media_type
+    )
+
+
+def count_key(user_id, course_id, query):
+    """
+    Return the key of the number of notes of a user in a course matching `query` in `counts`, or None if it
+    is disabled.
+
+    `query` identifies the filters of the notes, such as the SQL of their queryset.
+    """
+    if not is_count_enabled():
+        return None
+
+    current_versions = _get_versions([_user_version_key(user_id), _course_version_key(user_id, course_id)])
+    return counts.make_key(user_id, course_id, *current_versions, query)
+
+
+def get_or_set(request, user_id, course_id, get_data):
+    """
+    Return the cached response data of `request`, or the result of `get_data()`, which is cached.
+    """
+    key = response_key(request, user_id, course_id)
+    if key is None:
+        return get_data()
+
+    def get_primary_data():
+        with read_from_primary():
+            return get_data()
+
+    return responses.get_or_set(key, get_primary_data)
+
+
+def invalidate(user_id, course_id=None, usage_ids=()):
+    """
+    Invalidate the cached responses of a user, in a course and some of its usage ids, or in all of them.
+
+    When called in a transaction, this happens again once it is committed, so that responses
+    cached in the meantime from uncommitted data are invalidated too.
+    """
+    if course_id is None:
+        keys = [_user_version_key(user_id)] if is_enabled() or is_usage_search_enabled() or is_count_enabled() else []
+    else:
+        keys = [_course_version_key(user_id, course_id)] if is_enabled() or is_count_enabled() else []
+        if is_usage_search_enabled():
+            keys += [_usage_version_key(user_id, course_id, usage_id) for usage_id in set(usage_ids)]
+    if not keys:
+        return
+
+    def bump_versions():
+        for key in keys:
+            _bump_version(key)
+
+    bump_versions()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump_versions)
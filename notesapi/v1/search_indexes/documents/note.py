@@ -35,15 +35,20 @@ class NoteDocument(Document):
         """
         Prepare data.
         """
-        return f'{instance.text}{instance.tags}'
+        tags = instance.tags if isinstance(instance.tags, list) else []
+        return f'{instance.text} {" ".join(tags)}'
+
+    def prepare_ranges(self, instance):
+        """
+        Ranges are indexed as a JSON-encoded keyword.
+        """
+        return json.dumps(instance.ranges)
 
     def prepare_tags(self, instance):
-        try:
-            tags = json.loads(instance.tags)
-        except ValueError as exc:
-            log.warning("Field `tags` contains corrupted data. Data: %r. Exception: %r", instance.tags, exc)
-            tags = []
-        return tags
+        if not isinstance(instance.tags, list):
+            log.warning("Field `tags` contains corrupted data. Data: %r", instance.tags)
+            return []
+        return instance.tags
 
     class Django:
         model = Note
@@ -0,0 +1,122 @@
+"""
+Transactional outbox of the Elasticsearch index.
+
+By default, notes are indexed by `RealTimeSignalProcessor` when they are saved, in the request: a slow
+Elasticsearch slows down writes, and an unavailable one makes them fail. To index them in the background
+instead, use the outbox signal processor:
+
+    ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = 'notesapi.v1.search_indexes.outbox.OutboxSignalProcessor'
+
+and run a single worker, which indexes the changed notes with bulk requests:
+
+    ./manage.py process_index_outbox
+
+Batch creations and deletions, which send no signals, record their notes in their transaction too. User
+retirements do not go through the outbox: see `AnnotationSearchView.delete_user_notes`.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.db import models
+from django.utils import timezone
+from django_elasticsearch_dsl.signals import BaseSignalProcessor
+from elasticsearch.helpers import streaming_bulk
+
+from notesapi.v1.models import Note, NoteIndexOutbox
+
+from .documents import NoteDocument
+
+log = logging.getLogger(__name__)
+
+
+class OutboxSignalProcessor(BaseSignalProcessor):
+    """
+    Record the changed notes in `NoteIndexOutbox`, in the transaction of the change, instead of indexing them.
+    """
+
+    def setup(self):
+        models.signals.post_save.connect(self.handle_save, sender=Note)
+        models.signals.post_delete.connect(self.handle_delete, sender=Note)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save, sender=Note)
+        models.signals.post_delete.disconnect(self.handle_delete, sender=Note)
+
+    def handle_save(self, sender, instance, **kwargs):
+        enqueue([instance.pk])
+
+    def handle_delete(self, sender, instance, **kwargs):
+        enqueue([instance.pk])
+
+
+def is_enabled():
+    """
+    Return whether notes are indexed through the outbox.
+    """
+    return isinstance(apps.get_app_config("django_elasticsearch_dsl").signal_processor, OutboxSignalProcessor)
+
+
+def enqueue(note_ids):
+    """
+    Record that the documents of some notes must be updated.
+    """
+    NoteIndexOutbox.objects.bulk_create([NoteIndexOutbox(note_id=note_id) for note_id in note_ids])
+
+
+def process_outbox(batch_size=500, initial_backoff=1, max_backoff=300):
+    """
+    Index or delete the documents of a batch of notes of the outbox, with a single bulk request, and return
+    the number of processed rows.
+
+    Rows of the same note are coalesced into one action. The rows of documents that failed are retried
+    after an exponential backoff, from `initial_backoff` to `max_backoff` seconds. If Elasticsearch is
+    unavailable, the transport error is raised and no row is processed.
+    """
+    rows = list(
+        NoteIndexOutbox.objects.filter(next_attempt__lte=timezone.now()).order_by("id")[:batch_size]
+    )
+    if not rows:
+        return 0
+
+    note_ids = sorted({row.note_id for row in rows})
+    # Notes are read after the rows, so the documents are at least as recent as the changes of the rows.
+    notes = Note.objects.in_bulk(note_ids)
+    document = NoteDocument()
+    actions = [
+        document._prepare_action(notes[note_id], "index")  # pylint: disable=protected-access
+        if note_id in notes
+        else document._prepare_action(Note(id=note_id), "delete")  # pylint: disable=protected-access
+        for note_id in note_ids
+    ]
+
+    kwargs = {"refresh": True} if NoteDocument.django.auto_refresh else {}
+    failed_note_ids = set()
+    for ok, item in streaming_bulk(
+        document._get_connection(),  # pylint: disable=protected-access
+        actions,
+        raise_on_error=False,
+        max_retries=3,
+        initial_backoff=initial_backoff,
+        max_backoff=max_backoff,
+        **kwargs,
+    ):
+        if ok:
+            continue
+        action, result = next(iter(item.items()))
+        if action == "delete" and result.get("status") == 404:
+            # The document of a note that was never indexed.
+            continue
+        log.warning("Failed to %s the document of note %s: %s", action, result.get("_id"), result.get("error"))
+        failed_note_ids.add(int(result["_id"]))
+
+    NoteIndexOutbox.objects.filter(id__in=[row.id for row in rows if row.note_id not in failed_note_ids]).delete()
+    for row in rows:
+        if row.note_id in failed_note_ids:
+            row.next_attempt = timezone.now() + timedelta(
+                seconds=min(initial_backoff * 2 ** row.attempts, max_backoff)
+            )
+            row.attempts += 1
+            row.save(update_fields=["attempts", "next_attempt"])
+    return len(rows)
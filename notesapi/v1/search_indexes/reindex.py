@@ -0,0 +1,159 @@
+"""
+Rebuild of the Elasticsearch index without downtime.
+
+`./manage.py search_index --rebuild` deletes the index that is being searched before filling it again. The
+`reindex_elasticsearch` management command instead builds a new index, named after the index of
+ELASTICSEARCH_INDEX_NAMES and the time of the rebuild, then points the name of ELASTICSEARCH_INDEX_NAMES to
+it with an alias. Searches and writes use the previous index until then. The first rebuild replaces an
+index created with `search_index --create` by the alias, in the same atomic request.
+
+While it is built, the new index is not refreshed and has no replicas: its settings of
+ELASTICSEARCH_DSL_INDEX_SETTINGS are restored before the alias is swapped. Notes that are saved during the
+rebuild are indexed again once the alias is swapped, and the documents of notes that were deleted during
+the rebuild, such as by user retirements, are deleted.
+"""
+
+import logging
+
+from django.utils import timezone
+from elasticsearch.helpers import parallel_bulk
+
+from notesapi.v1.models import Note
+from notesapi.v1.views.common import missing_note_ids
+
+from .documents import NoteDocument
+from .documents.note import NOTE_INDEX
+
+log = logging.getLogger(__name__)
+
+# Name of the index of ELASTICSEARCH_INDEX_NAMES, which becomes an alias.
+ALIAS = NOTE_INDEX._name  # pylint: disable=protected-access
+
+# Settings of the index while it is built.
+BULK_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+def get_connection():
+    return NoteDocument._get_connection()  # pylint: disable=protected-access
+
+
+def iter_notes(batch_size, **filters):
+    """
+    Iterate over the notes by ranges of primary keys, without OFFSET.
+    """
+    last_id = 0
+    while True:
+        notes = list(Note.objects.filter(id__gt=last_id, **filters).order_by("id")[:batch_size])
+        if not notes:
+            return
+        yield from notes
+        last_id = notes[-1].id
+
+
+def get_indices():
+    """
+    Return the names of the indices the alias points to, or that of the index named like the alias.
+    """
+    es = get_connection()
+    if not es.indices.exists(index=ALIAS):
+        return []
+    return sorted(es.indices.get_alias(index=ALIAS))
+
+
+def build_index(name, batch_size=500, workers=4, on_progress=None):
+    """
+    Create an index named `name` with the mappings of the notes index, index all notes in it with parallel
+    bulk requests, and return their number.
+
+    `on_progress(count)` is called after every `batch_size` notes.
+    """
+    index = NOTE_INDEX.clone(name=name)
+    index.settings(**BULK_SETTINGS)
+    index.create(using=get_connection())
+
+    document = NoteDocument()
+    actions = (
+        {**document._prepare_action(note, "index"), "_index": name}  # pylint: disable=protected-access
+        for note in iter_notes(batch_size)
+    )
+    count = 0
+    for _ in parallel_bulk(get_connection(), actions, thread_count=workers, chunk_size=batch_size):
+        count += 1
+        if on_progress and count % batch_size == 0:
+            on_progress(count)
+
+    # pylint: disable=protected-access
+    get_connection().indices.put_settings(
+        index=name,
+        body={"index": {key: NOTE_INDEX._settings.get(key) for key in BULK_SETTINGS}},
+    )
+    get_connection().indices.refresh(index=name)
+    return count
+
+
+def swap_alias(name):
+    """
+    Point the alias of the notes index to the index named `name`, in a single atomic request, and return the
+    names of the indices it pointed to.
+    """
+    previous = get_indices()
+    actions = [{"add": {"index": name, "alias": ALIAS}}]
+    for index in previous:
+        if index == ALIAS:
+            # An index that was created with the name of the alias is replaced by it.
+            actions.append({"remove_index": {"index": index}})
+        else:
+            actions.append({"remove": {"index": index, "alias": ALIAS}})
+    get_connection().indices.update_aliases(body={"actions": actions})
+    return [index for index in previous if index != ALIAS]
+
+
+def delete_missing_documents(batch_size=500):
+    """
+    Delete the documents of the notes index whose notes no longer exist, and return their number.
+
+    Document ids are scrolled and checked by batches of `batch_size`.
+    """
+    hits = NoteDocument.search().source(False).params(size=batch_size).scan()
+    deleted = 0
+    batch = []
+    for hit in hits:
+        batch.append(int(hit.meta.id))
+        if len(batch) >= batch_size:
+            deleted += _delete_missing_documents(batch)
+            batch = []
+    return deleted + _delete_missing_documents(batch)
+
+
+def _delete_missing_documents(note_ids):
+    missing_ids = missing_note_ids(note_ids)
+    if missing_ids:
+        NoteDocument().update([Note(id=note_id) for note_id in missing_ids], action="delete", raise_on_error=False)
+    return len(missing_ids)
+
+
+def rebuild_index(batch_size=500, workers=4, delete_previous=False, on_progress=None):
+    """
+    Build a new notes index, swap the alias to it, and return its name, number of documents and number
+    of deleted documents.
+
+    Notes that were saved during the build are indexed again after the swap, and documents of notes that
+    were deleted during the build are deleted. With `delete_previous`, the indices the alias pointed to
+    are deleted.
+    """
+    started = timezone.now()
+    name = f"{ALIAS}_{started:%Y%m%d%H%M%S}"
+    try:
+        count = build_index(name, batch_size=batch_size, workers=workers, on_progress=on_progress)
+    except Exception:
+        log.exception("Failed to build index %s, deleting it", name)
+        get_connection().indices.delete(index=name, ignore_unavailable=True)
+        raise
+
+    previous = swap_alias(name)
+    NoteDocument().update(iter_notes(batch_size, updated__gte=started))
+    deleted = delete_missing_documents(batch_size)
+    if delete_previous:
+        for index in previous:
+            get_connection().indices.delete(index=index)
+    return name, count, deleted
@@ -0,0 +1,111 @@
+import itertools
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from notesapi.v1.caching import MISSING, LocalLRUCache, NotesCache
+
+
+class LocalLRUCacheTest(TestCase):
+    """
+    Tests for the in-process cache.
+    """
+    def test_eviction(self):
+        lru = LocalLRUCache(2)
+        lru.set("a", 1, 60)
+        lru.set("b", 2, 60)
+        self.assertEqual(lru.get("a"), 1)
+        lru.set("c", 3, 60)
+        self.assertIs(lru.get("b"), MISSING)
+        self.assertEqual(lru.get("a"), 1)
+        self.assertEqual(len(lru), 2)
+
+    def test_expiration(self):
+        lru = LocalLRUCache(2)
+        lru.set("a", 1, 60)
+        lru.set("b", 2, None)
+        lru.set("c", 3, 0)
+        with patch("notesapi.v1.caching.time.monotonic", return_value=10 ** 9):
+            self.assertIs(lru.get("a"), MISSING)
+            self.assertEqual(lru.get("b"), 2)
+        self.assertIs(lru.get("c"), MISSING)
+
+
+class NotesCacheTest(TestCase):
+    """
+    Tests for the two-tier cache.
+    """
+    def setUp(self):
+        cache.clear()
+        self.cache = NotesCache("test", timeout=60, negative_timeout=5)
+
+    def test_make_key(self):
+        key = self.cache.make_key("user", "course-v1:edX+DemoX+Demo_Course")
+        self.assertRegex(key, r"^notes:test:[0-9a-f]{32}$")
+        self.assertNotEqual(key, self.cache.make_key("user", "other course"))
+
+    def test_tiers(self):
+        key = self.cache.make_key("a")
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, {"total": 1})
+        self.assertEqual(cache.get(key), {"total": 1})
+
+        # Local copies are read without the shared cache.
+        cache.delete(key)
+        self.assertEqual(self.cache.get(key), {"total": 1})
+
+        # Values of other processes are copied locally.
+        self.cache.clear_local()
+        cache.set(key, {"total": 2})
+        self.assertEqual(self.cache.get(key), {"total": 2})
+        cache.delete(key)
+        self.assertEqual(self.cache.get(key), {"total": 2})
+
+        self.cache.delete(key)
+        self.assertIs(self.cache.get(key, MISSING), MISSING)
+
+    def test_no_local_copies(self):
+        shared_only = NotesCache("test", timeout=60, local_timeout=0)
+        key = shared_only.make_key("a")
+        shared_only.set(key, 1)
+        cache.delete(key)
+        self.assertIsNone(shared_only.get(key))
+
+    def test_negative_caching(self):
+        key = self.cache.make_key("a")
+        with patch.object(cache, "set", wraps=cache.set) as cache_set:
+            self.assertIsNone(self.cache.get_or_set(key, lambda: None))
+        self.assertEqual(cache_set.call_args.kwargs["timeout"], 5)
+        self.assertIsNone(self.cache.get_or_set(key, self.fail))
+        self.assertIsNone(self.cache.get(key, MISSING))
+
+    def test_get_or_set(self):
+        key = self.cache.make_key("a")
+        self.assertEqual(self.cache.get_or_set(key, lambda: 1), 1)
+        self.assertEqual(self.cache.get_or_set(key, self.fail), 1)
+        self.assertIsNone(cache.get(key + ":lock"))
+
+    def test_get_or_set_locked(self):
+        """
+        While another process computes the value, wait for it instead of computing it.
+        """
+        key = self.cache.make_key("a")
+        cache.add(key + ":lock", True)
+
+        def compute_in_other_process(_):
+            cache.set(key, 2)
+
+        with patch("notesapi.v1.caching.time.sleep", side_effect=compute_in_other_process):
+            self.assertEqual(self.cache.get_or_set(key, self.fail), 2)
+
+    def test_get_or_set_lock_timeout(self):
+        """
+        If the other process does not compute the value in time, compute it anyway.
+        """
+        key = self.cache.make_key("a")
+        cache.add(key + ":lock", True)
+        with patch("notesapi.v1.caching.time.sleep"):
+            with patch("notesapi.v1.caching.time.monotonic", side_effect=itertools.count(0, 0.6)):
+                self.assertEqual(self.cache.get_or_set(key, lambda: 3), 3)
+        self.assertEqual(cache.get(key), 3)
@@ -0,0 +1,122 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from notesapi.v1.db_routers import ReadReplicaRouter, read_from_replica, record_write
+from notesapi.v1.models import Note
+
+from .helpers import get_id_token
+
+TEST_USER = "test_user_id"
+
+
+@override_settings(DATABASE_READ_REPLICAS=["replica"], DATABASE_READ_YOUR_WRITES_SECONDS=0)
+class ReadReplicaRouterTest(APITestCase):
+    """
+    Tests for the routing of reads to read replicas.
+    """
+    def setUp(self):
+        cache.clear()
+        self.router = ReadReplicaRouter()
+
+    def test_read_from_replica(self):
+        self.assertIsNone(self.router.db_for_read(Note))
+        with read_from_replica(TEST_USER):
+            self.assertEqual(self.router.db_for_read(Note), "replica")
+            self.assertEqual(self.router.db_for_write(Note), "default")
+        self.assertIsNone(self.router.db_for_read(Note))
+
+    @override_settings(DATABASE_READ_REPLICAS=[])
+    def test_no_replicas(self):
+        with read_from_replica(TEST_USER):
+            self.assertIsNone(self.router.db_for_read(Note))
+
+    @override_settings(DATABASE_READ_YOUR_WRITES_SECONDS=10)
+    def test_read_your_writes(self):
+        record_write(TEST_USER)
+        with read_from_replica(TEST_USER):
+            self.assertIsNone(self.router.db_for_read(Note))
+        with read_from_replica("other_user"):
+            self.assertEqual(self.router.db_for_read(Note), "replica")
+        with read_from_replica():
+            self.assertEqual(self.router.db_for_read(Note), "replica")
+
+    def test_allow_migrate(self):
+        self.assertFalse(self.router.allow_migrate("replica", "v1"))
+        self.assertIsNone(self.router.allow_migrate("default", "v1"))
+
+    @override_settings(DATABASE_READ_YOUR_WRITES_SECONDS=10)
+    def test_views(self):
+        """
+        Reads of GET requests go to a replica, unless the user wrote notes recently.
+        """
+        self.client.credentials(HTTP_X_ANNOTATOR_AUTH_TOKEN=get_id_token(TEST_USER))
+        note = Note.objects.bulk_create([
+            Note(
+                user_id=TEST_USER, course_id="test-course-id", usage_id="test-usage-id", text="test note text",
+                ranges=[{"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10}],
+            )
+        ])[0]
+        note_id = note.id or Note.objects.get().id
+        params = {"user": TEST_USER, "course_id": "test-course-id"}
+        # The test database stands for the replica.
+        with patch("notesapi.v1.db_routers.random.choice", return_value="default") as choice:
+            record_write(TEST_USER)
+            response = self.client.get(reverse("api:v1:annotations"), params)
+            self.assertEqual(response.json()["total"], 1)
+            choice.assert_not_called()
+
+            cache.clear()
+            for url in (
+                reverse("api:v1:annotations"),
+                reverse("api:v1:annotations_detail", kwargs={"annotation_id": note_id}),
+                reverse("api:v1:annotations_search"),
+            ):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(choice.call_count, 3)
+
+    @override_settings(DATABASE_READ_YOUR_WRITES_SECONDS=10)
+    def test_writes_stay_on_primary(self):
+        """
+        Write requests do not read from replicas, and record the write of the user.
+        """
+        self.client.credentials(HTTP_X_ANNOTATOR_AUTH_TOKEN=get_id_token(TEST_USER))
+        with patch("notesapi.v1.db_routers.random.choice", return_value="default") as choice:
+            response = self.client.post(reverse("api:v1:annotations_retire"), {"user": TEST_USER})
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+            choice.assert_not_called()
+        with read_from_replica(TEST_USER):
+            self.assertIsNone(self.router.db_for_read(Note))
+
+    @override_settings(NOTES_RESPONSE_CACHE_TIMEOUT=60, NOTES_COUNT_CACHE_TIMEOUT=60)
+    def test_cache_filled_from_primary(self):
+        """
+        Responses that are cached are read from the primary, since replicas may lag behind their versions.
+        """
+        self.client.credentials(HTTP_X_ANNOTATOR_AUTH_TOKEN=get_id_token(TEST_USER))
+        params = {"user": TEST_USER, "course_id": "test-course-id"}
+        databases = []
+        route = ReadReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            databases.append(route(router, model, **hints))
+            return databases[-1]
+
+        # The test database stands for the replica.
+        with patch("notesapi.v1.db_routers.random.choice", return_value="default"), \
+                patch.object(ReadReplicaRouter, "db_for_read", autospec=True, side_effect=db_for_read):
+            for url in (reverse("api:v1:annotations"), reverse("api:v1:annotations_search")):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(databases)
+            self.assertEqual(set(databases), {None})
+
+            databases.clear()
+            with override_settings(NOTES_RESPONSE_CACHE_TIMEOUT=0, NOTES_COUNT_CACHE_TIMEOUT=0):
+                self.client.get(reverse("api:v1:annotations"), params)
+            self.assertEqual(set(databases), {"default"})
@@ -0,0 +1,216 @@
+import logging
+import timeit
+from io import StringIO
+from unittest import TestCase, skipIf
+from unittest.mock import Mock, patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase as DjangoTestCase
+
+from notesapi.v1.models import Note
+from notesapi.v1.views.common import AnnotationSearchView as BaseAnnotationSearchView
+
+log = logging.getLogger(__name__)
+
+
+@skipIf(settings.ES_DISABLED, "Do not test if Elasticsearch service is disabled.")
+class AnnotationSearchViewTest(TestCase):
+    """
+    Tests for the Elasticsearch search view that do not send requests to Elasticsearch.
+    """
+
+    def setUp(self):
+        # Importing the Elasticsearch documents connects their indexing signals.
+        # pylint: disable=import-outside-toplevel
+        from notesapi.v1.views import elasticsearch
+        self.elasticsearch = elasticsearch
+
+    def test_shared_search(self):
+        """
+        The search of the notes index is built once, and each query works on a copy of it.
+        """
+        view, other_view = self.elasticsearch.AnnotationSearchView(), self.elasticsearch.AnnotationSearchView()
+        self.assertIs(view.search, other_view.search)
+        self.assertEqual(view.search._index, [view.index])  # pylint: disable=protected-access
+        self.assertIs(view.client, self.elasticsearch.get_es())
+
+        view.params = {"text": "test"}
+        queryset = view.get_queryset()
+        self.assertIsNot(queryset, view.search)
+        self.assertFalse(hasattr(view.search, "model"))
+
+    def test_response_cacheable(self):
+        """
+        Searches in the database are cached like with the database backend, text searches in the index are not.
+        """
+        view = self.elasticsearch.AnnotationSearchView()
+        view.params = {"user": "test_user_id", "course_id": "test-course-id"}
+        self.assertTrue(view.is_response_cacheable)
+        view.params["text"] = "test"
+        self.assertFalse(view.is_response_cacheable)
+
+    def test_indexed_note_ids(self):
+        """
+        The ids of all documents are scrolled, without their source.
+        """
+        search = self.enterContext(patch.object(self.elasticsearch.NoteDocument, "search")).return_value
+        scan = search.source.return_value.params.return_value.scan
+        scan.return_value = [Mock(meta=Mock(id="1")), Mock(meta=Mock(id="2"))]
+
+        self.assertEqual(list(self.elasticsearch.AnnotationSearchView.get_indexed_note_ids(batch_size=2)), [1, 2])
+        search.filter.assert_not_called()
+        search.source.assert_called_once_with(False)
+        search.source.return_value.params.assert_called_once_with(size=2)
+
+    def test_search_built_once(self):
+        """
+        Instantiating the view, which happens on every request, does not build Elasticsearch objects.
+        """
+        view_class = self.elasticsearch.AnnotationSearchView
+        self.elasticsearch.get_note_search.cache_clear()
+        self.addCleanup(self.elasticsearch.get_note_search.cache_clear)
+        with patch.object(self.elasticsearch, "Search", wraps=self.elasticsearch.Search) as search_class:
+            views = [view_class() for _ in range(10)]
+            search_class.assert_not_called()
+            searches = {id(view.search) for view in views}
+
+        search_class.assert_called_once()
+        self.assertEqual(len(searches), 1)
+
+    def test_benchmark(self):
+        """
+        Log the cost of instantiating the view next to that of building a search, without gating on timings.
+        """
+        view_class = self.elasticsearch.AnnotationSearchView
+        view_time = min(timeit.repeat(view_class, number=1000, repeat=5))
+        base_view_time = min(timeit.repeat(BaseAnnotationSearchView, number=1000, repeat=5))
+        search_time = min(timeit.repeat(self.elasticsearch.get_note_search.__wrapped__, number=1000, repeat=5))
+        log.info(
+            "Instantiating 1000 views: Elasticsearch %.2fms, database %.2fms, building a search %.2fms",
+            view_time * 1000, base_view_time * 1000, search_time * 1000,
+        )
+
+
+@skipIf(settings.ES_DISABLED, "Do not test if Elasticsearch service is disabled.")
+class NoteDocumentTest(TestCase):
+    """
+    Tests for the preparation of the documents of notes.
+    """
+
+    def test_prepare_data(self):
+        # pylint: disable=import-outside-toplevel
+        from notesapi.v1.search_indexes.documents import NoteDocument
+        note = Note(text="test note text", tags=["café", "pear"])
+        self.assertEqual(NoteDocument().prepare_data(note), "test note text café pear")
+
+
+@skipIf(settings.ES_DISABLED, "Do not test if Elasticsearch service is disabled.")
+class ReindexTest(DjangoTestCase):
+    """
+    Tests for the rebuild of the Elasticsearch index, without Elasticsearch.
+    """
+
+    def setUp(self):
+        # pylint: disable=import-outside-toplevel
+        from notesapi.v1.search_indexes import reindex
+        self.reindex = reindex
+        self.es = self.enterContext(patch.object(reindex, "get_connection")).return_value
+        self.es.indices.exists.return_value = True
+        self.bulk_actions = []
+        self.enterContext(patch.object(reindex, "parallel_bulk", side_effect=self.parallel_bulk))
+        self.update = self.enterContext(patch.object(reindex.NoteDocument, "update"))
+        self.search = self.enterContext(patch.object(reindex.NoteDocument, "search")).return_value
+        self.scan = self.search.source.return_value.params.return_value.scan
+        # Notes are inserted without signals, so that they are not indexed.
+        Note.objects.bulk_create([
+            Note(
+                user_id="test_user_id", course_id="test-course-id", usage_id="usage", text=f"note {i}", ranges=[]
+            )
+            for i in range(5)
+        ])
+        self.note_ids = list(Note.objects.order_by("id").values_list("id", flat=True))
+        self.scan.return_value = [Mock(meta=Mock(id=str(note_id))) for note_id in self.note_ids]
+
+    def parallel_bulk(self, client, actions, **kwargs):  # pylint: disable=unused-argument
+        for action in actions:
+            self.bulk_actions.append(action)
+            yield True, {}
+        # A note saved during the rebuild.
+        Note.objects.get(id=self.note_ids[1]).save()
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command("reindex_elasticsearch", "--batch_size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_first_rebuild(self):
+        """
+        The index created with the name of the alias is replaced by the alias to the new index.
+        """
+        self.es.indices.get_alias.return_value = {self.reindex.ALIAS: {"aliases": {}}}
+        out = self.rebuild()
+
+        name = self.es.indices.create.call_args.kwargs["index"]
+        self.assertTrue(name.startswith(f"{self.reindex.ALIAS}_"))
+        body = self.es.indices.create.call_args.kwargs["body"]
+        self.assertEqual(body["settings"]["refresh_interval"], "-1")
+        self.assertEqual(body["settings"]["number_of_replicas"], 0)
+        self.assertIn("text", body["mappings"]["properties"])
+
+        self.assertEqual([action["_id"] for action in self.bulk_actions], self.note_ids)
+        self.assertEqual({action["_index"] for action in self.bulk_actions}, {name})
+        self.assertIn("Indexed 4 notes", out)
+        self.assertIn(f"Re-indexed 5 notes in {name}", out)
+
+        self.es.indices.put_settings.assert_called_once_with(
+            index=name, body={"index": {"refresh_interval": None, "number_of_replicas": 0}}
+        )
+        self.es.indices.update_aliases.assert_called_once_with(body={"actions": [
+            {"add": {"index": name, "alias": self.reindex.ALIAS}},
+            {"remove_index": {"index": self.reindex.ALIAS}},
+        ]})
+        # Notes saved during the rebuild are indexed again.
+        self.assertEqual([note.id for note in self.update.call_args.args[0]], [self.note_ids[1]])
+        self.es.indices.delete.assert_not_called()
+        self.assertIn("Deleted 0 documents", out)
+
+    def test_notes_deleted_during_rebuild(self):
+        """
+        Documents of notes deleted during the rebuild, such as by retirements, are deleted after the swap.
+        """
+        self.es.indices.get_alias.return_value = {}
+        Note.objects.filter(id__in=self.note_ids[3:]).delete()
+        self.update.reset_mock()
+        out = self.rebuild()
+
+        self.search.source.assert_called_once_with(False)
+        # Document ids are checked by batches.
+        delete_calls = [call for call in self.update.call_args_list if call.kwargs.get("action") == "delete"]
+        self.assertEqual(
+            [[note.id for note in call.args[0]] for call in delete_calls], [[self.note_ids[3]], [self.note_ids[4]]]
+        )
+        self.assertIn("Deleted 2 documents", out)
+
+    def test_delete_previous(self):
+        previous = f"{self.reindex.ALIAS}_20260101000000"
+        self.es.indices.get_alias.return_value = {previous: {"aliases": {self.reindex.ALIAS: {}}}}
+        self.rebuild("--delete_previous")
+
+        name = self.es.indices.create.call_args.kwargs["index"]
+        self.es.indices.update_aliases.assert_called_once_with(body={"actions": [
+            {"add": {"index": name, "alias": self.reindex.ALIAS}},
+            {"remove": {"index": previous, "alias": self.reindex.ALIAS}},
+        ]})
+        self.es.indices.delete.assert_called_once_with(index=previous)
+
+    def test_failed_build(self):
+        """
+        The new index is deleted and the alias is left unchanged.
+        """
+        self.reindex.parallel_bulk.side_effect = RuntimeError("bulk failed")
+        with self.assertRaises(RuntimeError):
+            self.rebuild()
+        name = self.es.indices.create.call_args.kwargs["index"]
+        self.es.indices.delete.assert_called_once_with(index=name, ignore_unavailable=True)
+        self.es.indices.update_aliases.assert_not_called()
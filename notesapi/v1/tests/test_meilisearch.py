@@ -1,9 +1,19 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import Mock, patch
 
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
 
 from notesapi.v1.models import Note
-from notesapi.v1.views import meilisearch
+from notesapi.v1.views import AnnotationBatchView, AnnotationRetireView, meilisearch
 
 
 class MeilisearchTest(TestCase):
@@ -23,6 +33,7 @@ class MeilisearchTest(TestCase):
             patch.object(meilisearch.Client, "meilisearch_client", Mock())
         )
         self.enterContext(patch.object(meilisearch.Client, "meilisearch_index", Mock()))
+        meilisearch.pending_notes.clear()
 
     @property
     def note_dict(self):
@@ -45,22 +56,74 @@ class MeilisearchTest(TestCase):
 
     def test_save_delete_note(self):
         note = Note.create(self.note_dict)
-        note.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            note.save()
+            meilisearch.Client.meilisearch_index.add_documents.assert_not_called()
         note_id = note.id
 
-        meilisearch.Client.meilisearch_index.add_documents.assert_called_with(
+        meilisearch.Client.meilisearch_index.add_documents.assert_called_once_with(
             [
                 {
                     "id": note_id,
                     "user_id": "test_user_id",
                     "course_id": "org/course/run",
                     "text": "test note text",
+                    "updated": note.updated.timestamp(),
                 }
             ]
         )
 
-        note.delete()
-        meilisearch.Client.meilisearch_index.delete_document.assert_called_with(note_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            note.delete()
+        meilisearch.Client.meilisearch_index.delete_document.assert_not_called()
+        meilisearch.Client.meilisearch_index.delete_documents.assert_called_once_with([note_id])
+
+    def test_coalesced_changes(self):
+        """
+        The documents changed by a transaction are updated once it is committed, with one request per kind.
+        """
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            notes = [Note.create(self.note_dict) for _ in range(3)]
+            for note in notes:
+                note.save()
+            notes[0].text = "updated"
+            notes[0].save()
+            deleted_id = notes[2].id
+            notes[2].delete()
+        assert callbacks
+
+        index = meilisearch.Client.meilisearch_index
+        index.add_documents.assert_called_once()
+        documents = sorted(index.add_documents.call_args.args[0], key=lambda document: document["id"])
+        assert [(document["id"], document["text"]) for document in documents] == [
+            (notes[0].id, "updated"), (notes[1].id, "test note text")
+        ]
+        index.delete_documents.assert_called_once_with([deleted_id])
+        assert list(meilisearch.recent_task_uids)[-2:] == [
+            index.add_documents.return_value.task_uid, index.delete_documents.return_value.task_uid
+        ]
+
+    def test_rollback(self):
+        """
+        Changes of transactions that are rolled back are not indexed.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    Note.create(self.note_dict).save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        meilisearch.Client.meilisearch_index.add_documents.assert_not_called()
+
+    def test_flush_errors(self):
+        """
+        Meilisearch errors do not fail committed writes.
+        """
+        meilisearch.Client.meilisearch_index.add_documents.side_effect = RuntimeError
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.create(self.note_dict).save()
+        assert Note.objects.count() == 1
 
     def test_get_queryset_no_result(self):
         queryset = meilisearch.AnnotationSearchView().get_queryset()
@@ -94,3 +157,254 @@ class MeilisearchTest(TestCase):
                 },
             )
             assert [note2.id] == [note.id for note in queryset]
+
+    @override_settings(DISABLE_TOKEN_CHECK=True)
+    def test_create_batch(self):
+        note = self.note_dict
+        payload = {"user": note.pop("user"), "course_id": note.pop("course_id"), "notes": [note, note]}
+        request = APIRequestFactory().post("/api/v1/annotations/batch/", payload, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = AnnotationBatchView.as_view(search_view_class=meilisearch.AnnotationSearchView)(request)
+        assert response.status_code == 201
+
+        meilisearch.Client.meilisearch_index.add_documents.assert_called_once_with(
+            [
+                {
+                    "id": int(annotation["id"]),
+                    "user_id": "test_user_id",
+                    "course_id": "org/course/run",
+                    "text": "test note text",
+                    "updated": Note.objects.get(id=annotation["id"]).updated.timestamp(),
+                }
+                for annotation in response.data
+            ]
+        )
+
+    @override_settings(DISABLE_TOKEN_CHECK=True)
+    def test_delete_batch(self):
+        notes = [Note.create(self.note_dict) for _ in range(3)]
+        for note in notes:
+            note.save()
+        note_ids = [notes[0].id, notes[2].id]
+
+        payload = {"user": "test_user_id", "ids": note_ids}
+        request = APIRequestFactory().delete("/api/v1/annotations/batch/", payload, format="json")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = AnnotationBatchView.as_view(search_view_class=meilisearch.AnnotationSearchView)(request)
+        assert response.status_code == 204
+
+        assert list(Note.objects.values_list("id", flat=True)) == [notes[1].id]
+        meilisearch.Client.meilisearch_index.delete_document.assert_not_called()
+        meilisearch.Client.meilisearch_index.delete_documents.assert_called_once_with(note_ids)
+
+    @override_settings(DISABLE_TOKEN_CHECK=True)
+    def test_retire_user(self):
+        for _ in range(3):
+            Note.create(self.note_dict).save()
+
+        request = APIRequestFactory().post("/api/v1/retire_annotations/", {"user": "test_user_id"}, format="json")
+        response = AnnotationRetireView.as_view(search_view_class=meilisearch.AnnotationSearchView)(request)
+        assert response.status_code == 204
+
+        assert not Note.objects.exists()
+        meilisearch.Client.meilisearch_index.delete_document.assert_not_called()
+        meilisearch.Client.meilisearch_index.delete_documents.assert_called_once_with(
+            filter="user_id = 'test_user_id'"
+        )
+
+    @override_settings(DISABLE_TOKEN_CHECK=True)
+    def test_retire_user_quoted_id(self):
+        """
+        Quotes in the user id cannot change which documents are deleted.
+        """
+        request = APIRequestFactory().post(
+            "/api/v1/retire_annotations/", {"user": "x' OR user_id != '\\"}, format="json"
+        )
+        response = AnnotationRetireView.as_view(search_view_class=meilisearch.AnnotationSearchView)(request)
+        assert response.status_code == 204
+
+        meilisearch.Client.meilisearch_index.delete_documents.assert_called_once_with(
+            filter="user_id = 'x\\' OR user_id != \\'\\\\'"
+        )
+
+
+class ClientTest(TestCase):
+
+    def setUp(self):
+        meilisearch.Client.reset()
+        self.addCleanup(meilisearch.Client.reset)
+        self.meilisearch_client_class = self.enterContext(
+            patch.object(meilisearch.meilisearch, "Client")
+        )
+        self.meilisearch_client = self.meilisearch_client_class.return_value
+        self.meilisearch_client.get_index.return_value.get_filterable_attributes.return_value = [
+            "user_id", "course_id", "updated"
+        ]
+
+    def test_shared_client_and_index(self):
+        """
+        The client and the index are created and checked once per process.
+        """
+        index = meilisearch.Client().meilisearch_index
+        for _ in range(3):
+            assert meilisearch.Client().meilisearch_index is index
+            assert meilisearch.Client().meilisearch_client is self.meilisearch_client
+        self.meilisearch_client_class.assert_called_once()
+        self.meilisearch_client.get_index.assert_called_once_with("student_notes")
+        index.get_filterable_attributes.assert_called_once()
+        index.update_filterable_attributes.assert_not_called()
+
+        meilisearch.Client.reset()
+        meilisearch.Client().meilisearch_index.search("text")
+        assert self.meilisearch_client_class.call_count == 2
+        assert self.meilisearch_client.get_index.call_count == 2
+
+    def test_setup_index(self):
+        """
+        The index is created if it does not exist, and its filterable attributes are updated.
+        """
+        index = self.meilisearch_client.get_index.return_value
+        index.get_filterable_attributes.return_value = ["user_id"]
+        self.meilisearch_client.get_index.side_effect = [
+            meilisearch.meilisearch.errors.MeilisearchApiError("not found", Mock(text="")),
+            index,
+        ]
+        out = StringIO()
+        call_command("setup_meilisearch_index", stdout=out)
+
+        self.meilisearch_client.create_index.assert_called_once_with("student_notes", {"primaryKey": "id"})
+        assert sorted(index.update_filterable_attributes.call_args.args[0]) == ["course_id", "updated", "user_id"]
+        assert "is ready" in out.getvalue()
+        # The command does not keep the index of the process.
+        assert meilisearch.Client._INDEX is None  # pylint: disable=protected-access
+
+
+class ReindexTest(TransactionTestCase):
+
+    def setUp(self):
+        self.index = self.enterContext(patch.object(meilisearch.Client, "meilisearch_index", Mock()))
+        Note.objects.bulk_create([
+            Note(
+                user_id="test_user_id", course_id="org/course/run", usage_id="usage", text=f"note {i}", ranges=[]
+            )
+            for i in range(10)
+        ])
+        self.note_ids = list(Note.objects.order_by("id").values_list("id", flat=True))
+
+    def indexed_ids(self):
+        return sorted(
+            document["id"] for call in self.index.add_documents.call_args_list for document in call.args[0]
+        )
+
+    def test_reindex(self):
+        progress = []
+        assert meilisearch.reindex(batch_size=3, on_progress=lambda *args: progress.append(args)) == 10
+        assert self.index.add_documents.call_count == 4
+        assert self.indexed_ids() == self.note_ids
+        assert progress[-1] == (10, self.note_ids[-1])
+        assert [count for count, _ in progress] == [3, 6, 9, 10]
+
+    def test_parallel_reindex(self):
+        """
+        Progress is only reported up to the ranges that were all sent.
+        """
+        Note.objects.filter(id__in=self.note_ids[4:6]).delete()
+        progress = []
+        total = meilisearch.reindex(batch_size=2, workers=3, on_progress=lambda *args: progress.append(args))
+        assert total == 8
+        assert self.indexed_ids() == self.note_ids[:4] + self.note_ids[6:]
+        assert progress[-1] == (8, self.note_ids[-1])
+        assert [last_id for _, last_id in progress] == sorted(last_id for _, last_id in progress)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_file = os.path.join(directory, "checkpoint.json")
+            self.index.add_documents.side_effect = [Mock(task_uid=1), RuntimeError("unavailable")]
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    "reindex_meilisearch", "--batch_size", "5", "--workers", "1",
+                    "--checkpoint_file", checkpoint_file, stdout=StringIO(),
+                )
+            with open(checkpoint_file, encoding="utf-8") as f:
+                assert json.load(f) == {"last_id": self.note_ids[4]}
+
+            self.index.add_documents.reset_mock(side_effect=True)
+            out = StringIO()
+            call_command("reindex_meilisearch", "--batch_size", "5", "--checkpoint_file", checkpoint_file, stdout=out)
+            assert self.indexed_ids() == self.note_ids[5:]
+            assert f"Resuming after note {self.note_ids[4]}." in out.getvalue()
+            assert "Re-indexed 5 notes" in out.getvalue()
+
+            self.index.add_documents.reset_mock()
+            call_command(
+                "reindex_meilisearch", "--checkpoint_file", checkpoint_file, "--restart", stdout=StringIO()
+            )
+            assert self.indexed_ids() == self.note_ids
+
+
+@override_settings(ES_DISABLED=True, MEILISEARCH_ENABLED=True)
+class SyncTest(TestCase):
+
+    def setUp(self):
+        self.index = self.enterContext(patch.object(meilisearch.Client, "meilisearch_index", Mock()))
+        Note.objects.bulk_create([
+            Note(user_id="test_user_id", course_id="org/course/run", usage_id="usage", text=f"note {i}", ranges=[])
+            for i in range(5)
+        ])
+        self.note_ids = list(Note.objects.order_by("id").values_list("id", flat=True))
+        self.since = timezone.now() - timedelta(hours=1)
+        Note.objects.filter(id=self.note_ids[0]).update(updated=self.since - timedelta(hours=1))
+
+    def test_sync(self):
+        """
+        Notes updated since the date are indexed, and documents of deleted notes are removed.
+        """
+        deleted_id = self.note_ids[-1] + 1
+        self.index.get_documents.side_effect = [
+            Mock(results=[Mock(id=str(note_id)) for note_id in [self.note_ids[1], deleted_id]]),
+            Mock(results=[]),
+        ]
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("sync_search_index", "--since", self.since.isoformat(), "--batch_size", "2", stdout=out)
+
+        batches = [[document["id"] for document in call.args[0]] for call in self.index.add_documents.call_args_list]
+        assert batches == [self.note_ids[1:3], self.note_ids[3:5]]
+        self.index.delete_documents.assert_called_once_with([deleted_id])
+        assert "filter" not in self.index.get_documents.call_args.args[0]
+        assert "4 indexed, 1 deleted" in out.getvalue()
+
+    def test_sync_note_deleted_since(self):
+        """
+        The document of a note last updated before the date and deleted since then is removed.
+        """
+        Note.objects.filter(id=self.note_ids[0]).delete()
+        self.index.get_documents.side_effect = [
+            Mock(results=[Mock(id=str(note_id)) for note_id in self.note_ids[:2]]),
+            Mock(results=[]),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "sync_search_index", "--since", self.since.isoformat(), "--batch_size", "2", stdout=StringIO()
+            )
+
+        # Its document is not updated since the date: it is found only if all documents are listed.
+        assert "filter" not in self.index.get_documents.call_args.args[0]
+        self.index.delete_documents.assert_called_once_with([self.note_ids[0]])
+
+    def test_indexed_note_ids(self):
+        """
+        All documents are listed by pages, including those indexed without an update date.
+        """
+        self.index.get_documents.side_effect = [
+            Mock(results=[Mock(id="1"), Mock(id="2")]),
+            Mock(results=[Mock(id="3")]),
+        ]
+        assert meilisearch.AnnotationSearchView.get_indexed_note_ids(batch_size=2) == [1, 2, 3]
+        assert [call.args[0] for call in self.index.get_documents.call_args_list] == [
+            {"fields": ["id"], "offset": 0, "limit": 2}, {"fields": ["id"], "offset": 2, "limit": 2},
+        ]
+
+    def test_invalid_date(self):
+        with self.assertRaises(CommandError):
+            call_command("sync_search_index", "--since", "yesterday")
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from notesapi.v1 import membership
+from notesapi.v1.models import Note
+
+from .helpers import get_id_token
+
+TEST_USER = "test_user_id"
+TEST_COURSE = "test-course-id"
+
+
+@override_settings(NOTES_MEMBERSHIP_CACHE_TIMEOUT=60)
+class MembershipTest(APITestCase):
+    """
+    Tests for the cache of the users who have notes in a course.
+    """
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_X_ANNOTATOR_AUTH_TOKEN=get_id_token(TEST_USER))
+
+    def create_note(self, user_id=TEST_USER, course_id=TEST_COURSE):
+        """
+        Insert a note without the API.
+        """
+        Note.objects.bulk_create([
+            Note(
+                user_id=user_id, course_id=course_id, usage_id="test-usage-id", text="test note text",
+                ranges=[{"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10}],
+            )
+        ])
+
+    def create_notes(self, count=1):
+        """
+        Create notes with the API.
+        """
+        note = {
+            "usage_id": "test-usage-id",
+            "ranges": [{"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10}],
+            "quote": "test note quote",
+        }
+        payload = {"user": TEST_USER, "course_id": TEST_COURSE, "notes": [note] * count}
+        response = self.client.post(reverse("api:v1:annotations_batch"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_has_notes(self):
+        self.create_note(course_id="other-course-id")
+        with self.assertNumQueries(2):
+            for _ in range(2):
+                self.assertFalse(membership.has_notes(TEST_USER, TEST_COURSE))
+                self.assertTrue(membership.has_notes(TEST_USER, "other-course-id"))
+
+        membership.record_notes(TEST_USER, TEST_COURSE)
+        self.assertTrue(membership.has_notes(TEST_USER, TEST_COURSE))
+
+    def test_recorded_notes_are_kept(self):
+        """
+        A read that did not see notes does not overwrite a membership recorded in the meantime.
+        """
+        key = membership.memberships.make_key(TEST_USER, TEST_COURSE)
+        with self.captureOnCommitCallbacks(execute=True):
+            membership.record_notes(TEST_USER, TEST_COURSE)
+            cache.delete(key)
+            self.assertFalse(membership.has_notes(TEST_USER, TEST_COURSE))
+        self.assertTrue(membership.has_notes(TEST_USER, TEST_COURSE))
+
+    @override_settings(NOTES_MEMBERSHIP_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(membership.has_notes(TEST_USER, TEST_COURSE))
+
+    def test_views(self):
+        """
+        Users without notes get empty results without queries, and see their notes as soon as they create them.
+        """
+        params = {"user": TEST_USER, "course_id": TEST_COURSE}
+        with override_settings(NOTES_MEMBERSHIP_CACHE_TIMEOUT=0):
+            expected_list = self.client.get(reverse("api:v1:annotations"), params).json()
+            expected_search = self.client.get(reverse("api:v1:annotations_search"), params).json()
+
+        self.assertFalse(membership.has_notes(TEST_USER, TEST_COURSE))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("api:v1:annotations"), params)
+            self.assertEqual(response.json(), expected_list)
+            self.assertEqual(response.headers["ETag"], '"0"')
+            self.assertEqual(self.client.get(reverse("api:v1:annotations_search"), params).json(), expected_search)
+            response = self.client.get(reverse("api:v1:annotations_search"), {**params, "usage_id": "test-usage-id"})
+            self.assertEqual(response.json(), [])
+
+        self.create_notes(2)
+        self.assertEqual(self.client.get(reverse("api:v1:annotations"), params).json()["total"], 2)
+        self.assertEqual(self.client.get(reverse("api:v1:annotations_search"), params).json()["total"], 2)
+
+    def test_command(self):
+        self.assertFalse(membership.has_notes(TEST_USER, TEST_COURSE))
+        self.create_note()
+        self.create_note(user_id="other_user_id", course_id="other-course-id")
+        self.assertFalse(membership.has_notes(TEST_USER, TEST_COURSE))
+
+        out = StringIO()
+        call_command("record_notes_membership", "--course_ids", TEST_COURSE, "--batch_size", "1", stdout=out)
+        self.assertIn("Recorded 1 users with notes.", out.getvalue())
+        with self.assertNumQueries(0):
+            self.assertTrue(membership.has_notes(TEST_USER, TEST_COURSE))
+
+        call_command("record_notes_membership", stdout=out)
+        self.assertIn("Recorded 2 users with notes.", out.getvalue())
@@ -1,8 +1,12 @@
 from unittest import TestCase
+from unittest.mock import patch
 
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.test.utils import CaptureQueriesContext
 
-from notesapi.v1.models import Note
+from notesapi.v1.models import Note, NoteCounter
 from notesapi.v1.serializers import NoteSerializer
 
 
@@ -61,5 +65,125 @@ class NoteTest(TestCase):
         note.full_clean()
         note.save()
 
-        self.assertEqual("[]", note.tags)
+        self.assertEqual([], note.tags)
         self.assertEqual([], NoteSerializer(note).data["tags"])
+
+    def test_no_related_objects(self):
+        """
+        `delete_notes` deletes notes without collecting related objects, so no model may refer to notes.
+        """
+        self.assertEqual(Note._meta.related_objects, ())  # pylint: disable=protected-access
+
+
+class NoteQueryPlanTest(TestCase):
+    """
+    Guard the query plans of the list and search hot paths.
+    """
+    INDEX_NAME = "note_user_course_updated_idx"
+    # How MySQL and SQLite report that the ordering could not be read from an index.
+    FILESORT_MARKERS = ("Using filesort", "USE TEMP B-TREE FOR ORDER BY")
+
+    def setUp(self):
+        for user_id in ("test_user_id", "test_other_user_id"):
+            for course_id in ("org/course/run", "org/course/other_run"):
+                for usage_id in ("usage-1", "usage-2"):
+                    Note.create({
+                        "user": user_id,
+                        "course_id": course_id,
+                        "usage_id": usage_id,
+                        "ranges": [{"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10}],
+                    }).save()
+
+    def tearDown(self):
+        Note.objects.all().delete()
+
+    def assert_uses_composite_index(self, queryset):
+        plan = queryset.explain()
+        self.assertIn(self.INDEX_NAME, plan)
+        for marker in self.FILESORT_MARKERS:
+            self.assertNotIn(marker, plan)
+
+    def test_list_query_plan(self):
+        queryset = Note.objects.filter(course_id="org/course/run", user_id="test_user_id").order_by("-updated")
+        self.assert_uses_composite_index(queryset)
+        self.assert_uses_composite_index(queryset[10:20])
+
+    def test_search_query_plan(self):
+        queryset = Note.objects.filter(
+            course_id="org/course/run", user_id="test_user_id", usage_id__in=["usage-1", "usage-2"]
+        ).order_by("-updated")
+        self.assert_uses_composite_index(queryset)
+
+        queryset = Note.objects.filter(course_id="org/course/run", user_id="test_user_id").filter(
+            Q(text__icontains="note") | Q(tags__icontains="note")
+        ).order_by("-updated")
+        self.assert_uses_composite_index(queryset)
+
+
+class NoteCounterTest(TestCase):
+    """
+    Tests for the per-(user, course) note counter.
+    """
+    def setUp(self):
+        for _ in range(3):
+            Note.create({
+                "user": "test_user_id",
+                "course_id": "org/course/run",
+                "usage_id": "usage-1",
+                "ranges": [{"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10}],
+            }).save()
+
+    def tearDown(self):
+        Note.objects.all().delete()
+        NoteCounter.objects.all().delete()
+
+    def get_count(self, user_id="test_user_id", course_id="org/course/run"):
+        return NoteCounter.objects.get(user_id=user_id, course_id=course_id).count
+
+    def test_increment_initializes_from_notes(self):
+        self.assertEqual(NoteCounter.increment("test_user_id", "org/course/run"), 4)
+        self.assertEqual(self.get_count(), 4)
+
+        self.assertEqual(NoteCounter.increment("test_user_id", "org/course/other_run", amount=2), 2)
+        self.assertEqual(self.get_count(course_id="org/course/other_run"), 2)
+
+    def test_increment_limit(self):
+        self.assertIsNone(NoteCounter.increment("test_user_id", "org/course/run", limit=3))
+        self.assertEqual(self.get_count(), 3)
+
+        self.assertEqual(NoteCounter.increment("test_user_id", "org/course/run", limit=4), 4)
+        self.assertIsNone(NoteCounter.increment("test_user_id", "org/course/run", limit=4))
+        self.assertIsNone(NoteCounter.increment("test_user_id", "org/course/run", amount=2, limit=5))
+        self.assertEqual(self.get_count(), 4)
+
+    def test_limit_reached_without_counting(self):
+        """
+        Increments that are rejected at the limit do not count the notes.
+        """
+        NoteCounter.increment("test_user_id", "org/course/run")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIsNone(NoteCounter.increment("test_user_id", "org/course/run", limit=4))
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any("COUNT" in query["sql"] for query in queries))
+
+    def test_concurrent_creation(self):
+        """
+        A counter created by another transaction while the notes are counted is incremented.
+        """
+        count = QuerySet.count
+
+        def count_and_create_counter(queryset):
+            NoteCounter.objects.bulk_create([NoteCounter(user_id="test_user_id", course_id="org/course/run", count=3)])
+            return count(queryset)
+
+        with patch.object(QuerySet, "count", autospec=True, side_effect=count_and_create_counter):
+            self.assertEqual(NoteCounter.increment("test_user_id", "org/course/run", limit=10), 4)
+        self.assertEqual(self.get_count(), 4)
+
+    def test_decrement(self):
+        NoteCounter.increment("test_user_id", "org/course/run")
+        NoteCounter.decrement("test_user_id", "org/course/run", amount=2)
+        self.assertEqual(self.get_count(), 2)
+
+        NoteCounter.decrement("test_user_id", "org/course/run", amount=5)
+        self.assertEqual(self.get_count(), 0)
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from notesapi.v1.models import Note, NoteIndexOutbox
+from notesapi.v1.views import AnnotationBatchView
+
+
+@skipIf(settings.ES_DISABLED, "Do not test if Elasticsearch service is disabled.")
+class OutboxTest(TestCase):
+    """
+    Tests for the outbox of the Elasticsearch index, without Elasticsearch.
+    """
+
+    def setUp(self):
+        # Importing the Elasticsearch documents connects their indexing signals.
+        # pylint: disable=import-outside-toplevel
+        from elasticsearch.exceptions import ConnectionError as ESConnectionError
+
+        from notesapi.v1.search_indexes import outbox
+        self.outbox = outbox
+        self.connection_error = ESConnectionError("N/A", "Connection refused", OSError())
+        self.streaming_bulk = self.enterContext(patch.object(outbox, "streaming_bulk"))
+        # Notes are inserted without signals, so that they are not indexed.
+        self.notes = Note.objects.bulk_create([
+            Note(
+                user_id="test_user_id", course_id="test-course-id", usage_id="test-usage-id", text=f"note {i}",
+                ranges=[{"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10}],
+            )
+            for i in range(2)
+        ])
+        self.note_ids = list(Note.objects.order_by("id").values_list("id", flat=True))
+
+    def bulk_actions(self):
+        """
+        Return the (action, document id) pairs sent with the last bulk request.
+        """
+        actions = self.streaming_bulk.call_args.args[1]
+        return [(action["_op_type"], action["_id"]) for action in actions]
+
+    def test_signal_processor(self):
+        processor = self.outbox.OutboxSignalProcessor(None)
+        self.addCleanup(processor.teardown)
+        note = Note.objects.get(id=self.note_ids[0])
+        processor.handle_save(Note, note)
+        processor.handle_delete(Note, note)
+        self.assertEqual(list(NoteIndexOutbox.objects.values_list("note_id", flat=True)), [note.id, note.id])
+
+    def test_process_outbox(self):
+        """
+        Rows of the same note are coalesced, and deleted notes are deleted from the index.
+        """
+        deleted_id = self.note_ids[-1] + 1
+        self.outbox.enqueue([self.note_ids[0], deleted_id, self.note_ids[0], self.note_ids[1]])
+        self.streaming_bulk.return_value = [
+            (True, {"index": {"_id": str(self.note_ids[0]), "status": 200}}),
+            (True, {"index": {"_id": str(self.note_ids[1]), "status": 200}}),
+            (False, {"delete": {"_id": str(deleted_id), "status": 404}}),
+        ]
+
+        self.assertEqual(self.outbox.process_outbox(), 4)
+        self.assertEqual(
+            self.bulk_actions(),
+            [("index", self.note_ids[0]), ("index", self.note_ids[1]), ("delete", deleted_id)],
+        )
+        self.assertFalse(NoteIndexOutbox.objects.exists())
+        self.assertEqual(self.outbox.process_outbox(), 0)
+
+    def test_failed_documents(self):
+        """
+        Rows of documents that failed are retried after a backoff.
+        """
+        self.outbox.enqueue(self.note_ids)
+        self.streaming_bulk.return_value = [
+            (True, {"index": {"_id": str(self.note_ids[0]), "status": 200}}),
+            (False, {"index": {"_id": str(self.note_ids[1]), "status": 500, "error": "error"}}),
+        ]
+        self.assertEqual(self.outbox.process_outbox(initial_backoff=10), 2)
+
+        row = NoteIndexOutbox.objects.get()
+        self.assertEqual((row.note_id, row.attempts), (self.note_ids[1], 1))
+        self.assertGreater(row.next_attempt, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.outbox.process_outbox(), 0)
+
+        NoteIndexOutbox.objects.update(next_attempt=timezone.now())
+        self.streaming_bulk.return_value = [(True, {"index": {"_id": str(self.note_ids[1]), "status": 200}})]
+        self.assertEqual(self.outbox.process_outbox(), 1)
+        self.assertFalse(NoteIndexOutbox.objects.exists())
+
+    def test_command(self):
+        self.outbox.enqueue(self.note_ids)
+        self.streaming_bulk.side_effect = self.connection_error
+        with self.assertRaises(CommandError):
+            call_command("process_index_outbox", "--once")
+        self.assertEqual(NoteIndexOutbox.objects.count(), 2)
+
+        self.streaming_bulk.side_effect = None
+        self.streaming_bulk.return_value = []
+        call_command("process_index_outbox", "--once", "--batch_size", "1")
+        self.assertEqual(self.streaming_bulk.call_count, 3)
+        self.assertFalse(NoteIndexOutbox.objects.exists())
+
+    @override_settings(DISABLE_TOKEN_CHECK=True)
+    def test_batch_enqueued_in_transaction(self):
+        """
+        The notes of batch creations and deletions are recorded in the transaction that changes them, so that
+        they are not lost if the request fails once it is committed.
+        """
+        # pylint: disable=import-outside-toplevel
+        from notesapi.v1.views.elasticsearch import AnnotationSearchView
+        self.enterContext(patch.object(self.outbox, "is_enabled", return_value=True))
+        self.enterContext(patch("notesapi.v1.views.common.record_write", side_effect=RuntimeError))
+        view = AnnotationBatchView.as_view(search_view_class=AnnotationSearchView)
+
+        note = {"usage_id": "test-usage-id", "quote": "quote", "text": "text", "ranges": self.notes[0].ranges}
+        payload = {"user": "test_user_id", "course_id": "test-course-id", "notes": [note, note]}
+        with self.assertRaises(RuntimeError):
+            view(APIRequestFactory().post("/api/v1/annotations/batch/", payload, format="json"))
+        created_ids = list(Note.objects.exclude(id__in=self.note_ids).values_list("id", flat=True))
+        self.assertEqual(len(created_ids), 2)
+        self.assertEqual(sorted(NoteIndexOutbox.objects.values_list("note_id", flat=True)), sorted(created_ids))
+
+        NoteIndexOutbox.objects.all().delete()
+        payload = {"user": "test_user_id", "ids": self.note_ids}
+        with self.assertRaises(RuntimeError):
+            view(APIRequestFactory().delete("/api/v1/annotations/batch/", payload, format="json"))
+        self.assertFalse(Note.objects.filter(id__in=self.note_ids).exists())
+        self.assertEqual(sorted(NoteIndexOutbox.objects.values_list("note_id", flat=True)), self.note_ids)
@@ -0,0 +1,44 @@
+import json
+from datetime import UTC, datetime
+from unittest import TestCase
+
+from rest_framework.renderers import JSONRenderer
+
+from notesapi.v1.renderers import NotesJSONRenderer, RawJSON
+
+
+class NotesJSONRendererTest(TestCase):
+    """
+    Tests for the renderer that passes through pre-encoded JSON.
+    """
+    def test_plain_data(self):
+        data = {
+            "total": 1,
+            "next": None,
+            "rows": [
+                {"id": "1", "text": "محمد   <b>", "tags": ["a", "b"], "updated": datetime(2020, 1, 1, tzinfo=UTC)}
+            ],
+        }
+        self.assertEqual(NotesJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(NotesJSONRenderer().render("Annotation not found!"), b'"Annotation not found!"')
+        self.assertEqual(NotesJSONRenderer().render(None), b'')
+
+    def test_raw_json(self):
+        data = {
+            "total": 2,
+            "rows": [
+                {"id": "1", "ranges": RawJSON('[{"start": "/p[1]"}]'), "tags": RawJSON('["a"]'), "text": "x"},
+                {"id": "2", "ranges": RawJSON('[]'), "tags": RawJSON('[]'), "text": "y"},
+            ],
+        }
+        self.assertEqual(
+            NotesJSONRenderer().render(data),
+            b'{"total":2,"rows":[{"id":"1","ranges":[{"start": "/p[1]"}],"tags":["a"],"text":"x"},'
+            b'{"id":"2","ranges":[],"tags":[],"text":"y"}]}',
+        )
+
+    def test_raw_json_indent(self):
+        data = [{"id": "1", "tags": RawJSON('["a"]')}]
+        rendered = NotesJSONRenderer().render(data, "application/json; indent=2")
+        self.assertEqual(rendered, JSONRenderer().render([{"id": "1", "tags": ["a"]}], "application/json; indent=2"))
+        self.assertEqual(json.loads(rendered), [{"id": "1", "tags": ["a"]}])
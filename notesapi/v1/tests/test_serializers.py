@@ -0,0 +1,100 @@
+import json
+import logging
+import timeit
+from unittest import TestCase
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from notesapi.v1.models import Note
+from notesapi.v1.renderers import NotesJSONRenderer
+from notesapi.v1.serializers import NOTE_ROW_FIELDS, NoteSerializer, serialize_note_row, serialize_note_rows
+
+log = logging.getLogger(__name__)
+
+
+class SerializeNoteRowsTest(TestCase):
+    """
+    Tests for the fast read-only note serialization.
+    """
+    def setUp(self):
+        self.notes = []
+        for i, tags in enumerate([[], ["apple", "pear"], ["عمار", "Muhammad"]]):
+            note = Note.create({
+                "user": "test_user_id",
+                "course_id": "org/course/run",
+                "usage_id": f"usage-{i}",
+                "quote": f"test note quote {i}",
+                "text": "Ammar محمد عمار Muhammad <b>bold</b>",
+                "ranges": [
+                    {"start": "/p[1]", "end": "/p[1]", "startOffset": 0, "endOffset": 10},
+                    {"start": "/p[2]", "end": "/p[2]", "startOffset": i, "endOffset": 22},
+                ],
+                "tags": tags,
+            })
+            note.save()
+            self.notes.append(note)
+
+    def tearDown(self):
+        Note.objects.all().delete()
+
+    def test_same_json_as_note_serializer(self):
+        """
+        The output is JSON-equivalent to that of `NoteSerializer`, but not byte-identical: ranges and tags
+        keep the key order and separators the database stores them with.
+        """
+        notes = Note.objects.order_by("id")
+        rows = notes.values_list(*NOTE_ROW_FIELDS)
+
+        self.assertEqual(
+            json.loads(NotesJSONRenderer().render(serialize_note_rows(rows))),
+            json.loads(JSONRenderer().render(NoteSerializer(notes, many=True).data)),
+        )
+
+    def test_single_row(self):
+        note = self.notes[1]
+        row = Note.objects.values_list(*NOTE_ROW_FIELDS).get(id=note.id)
+
+        self.assertEqual(
+            json.loads(NotesJSONRenderer().render(serialize_note_row(row))),
+            json.loads(JSONRenderer().render(NoteSerializer(Note.objects.get(id=note.id)).data)),
+        )
+
+    def test_no_model_instances(self):
+        """
+        Rows are fetched with a single query and serialized without instantiating notes.
+        """
+        with CaptureQueriesContext(connection) as queries, patch.object(Note, "from_db") as from_db:
+            data = serialize_note_rows(Note.objects.order_by("-updated").values_list(*NOTE_ROW_FIELDS))
+
+        self.assertEqual(len(queries), 1)
+        from_db.assert_not_called()
+        self.assertEqual([note["id"] for note in data], [str(note.id) for note in reversed(self.notes)])
+
+    def test_benchmark(self):
+        """
+        Log the cost of the fast serialization next to that of `NoteSerializer`, without gating on timings.
+        """
+        Note.objects.bulk_create([
+            Note(
+                user_id="test_user_id",
+                course_id="org/course/run",
+                usage_id="usage",
+                quote="foo bar baz",
+                text="test note text " * 10,
+                ranges=note.ranges,
+                tags=note.tags,
+            )
+            for note in self.notes * 100
+        ])
+        notes = list(Note.objects.order_by("-updated"))
+        rows = list(Note.objects.order_by("-updated").values_list(*NOTE_ROW_FIELDS))
+
+        serializer_time = min(timeit.repeat(lambda: NoteSerializer(notes, many=True).data, number=1, repeat=5))
+        rows_time = min(timeit.repeat(lambda: serialize_note_rows(rows), number=1, repeat=5))
+        log.info(
+            "Serializing %d notes: NoteSerializer %.2fms, serialize_note_rows %.2fms",
+            len(notes), serializer_time * 1000, rows_time * 1000,
+        )
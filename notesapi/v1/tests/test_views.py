@@ -1,3 +1,4 @@
+import time
 import unittest
 from calendar import timegm
 from datetime import UTC, datetime, timedelta
@@ -7,12 +8,21 @@ from urllib import parse
 import ddt
 import jwt
 from django.conf import settings
+from django.core.cache import cache
 from django.core.management import call_command
 from django.test.utils import override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from notesapi.v1 import response_cache
+from notesapi.v1.models import Note
+from notesapi.v1.permissions import ValidatedTokenCache, validated_tokens
+from notesapi.v1.views.common import AnnotationSearchView as DatabaseAnnotationSearchView
+
 from .helpers import get_id_token
 
 TEST_USER = "test_user_id"
@@ -86,7 +96,7 @@ class BaseAnnotationViewTests(APITestCase):
         url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': annotation_id})
         response = self.client.get(url, self.headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        return response.data
+        return response.json()
 
     def _get_search_results(self, **kwargs):
         """
@@ -96,7 +106,7 @@ class BaseAnnotationViewTests(APITestCase):
         data.update(kwargs)
         url = reverse('api:v1:annotations_search')
         result = self.client.get(url, data=data)
-        return result.data
+        return result.json()
 
     def get_annotations(self, query_parameters=None, expected_status=200):
         """
@@ -107,7 +117,7 @@ class BaseAnnotationViewTests(APITestCase):
             data.update(query_parameters)
         response = self.client.get(reverse('api:v1:annotations'), data=data)
         self.assertEqual(expected_status, response.status_code)
-        return response.data
+        return response.json()
 
     # pylint: disable=too-many-positional-arguments
     def verify_pagination_info(
@@ -219,6 +229,47 @@ class BaseAnnotationViewTests(APITestCase):
             start=start
         )
 
+    def verify_cursor_pagination(self, url, query_parameters):
+        """
+        Verify that following the cursor pagination links walks through all annotations exactly once.
+
+        Argument:
+            url: url of the paginated view
+            query_parameters: query parameters of the first page
+        """
+        for i in range(7):
+            self._create_annotation(text=f'annotation {i}')
+        # Notes updated at the same time are told apart by their id.
+        Note.objects.filter(text__in=['annotation 1', 'annotation 2', 'annotation 3', 'annotation 4']).update(
+            updated=timezone.now()
+        )
+        expected_ids = [
+            str(pk) for pk in Note.objects.order_by('-updated', '-id').values_list('id', flat=True)
+        ]
+
+        pages = []
+        response = self.client.get(url, data=dict(query_parameters, cursor='', page_size=3))
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(set(response.json()), {'next', 'previous', 'rows'})
+            pages.append(response.json())
+            if response.json()['next'] is None:
+                break
+            response = self.client.get(response.json()['next'])
+
+        self.assertEqual([len(page['rows']) for page in pages], [3, 3, 1])
+        self.assertEqual([row['id'] for page in pages for row in page['rows']], expected_ids)
+        self.assertIsNone(pages[0]['previous'])
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.json()['rows'], pages[1]['rows'])
+        response = self.client.get(response.json()['previous'])
+        self.assertEqual(response.json()['rows'], pages[0]['rows'])
+        self.assertIsNone(response.json()['previous'])
+
+        response = self.client.get(url, data=dict(query_parameters, cursor='invalid'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
 
 @ddt.ddt
 class AnnotationListViewTests(BaseAnnotationViewTests):
@@ -253,6 +304,15 @@ class AnnotationListViewTests(BaseAnnotationViewTests):
 
         self.assertEqual(response.data['user'], TEST_USER)
 
+    @patch("notesapi.v1.views.common.set_custom_attribute")
+    def test_create_note_count_attribute(self, mock_set_custom_attribute):
+        """
+        The number of notes the user had in the course before the new one is recorded for monitoring.
+        """
+        self._create_annotation()
+        self._create_annotation()
+        mock_set_custom_attribute.assert_called_with("notes.count", 1)
+
     def test_create_blank_text(self):
         """
         Ensure we can create a new note with empty text field.
@@ -338,7 +398,7 @@ class AnnotationListViewTests(BaseAnnotationViewTests):
         response = self.client.get(url, self.headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        annotation = response.data
+        annotation = response.json()
         del annotation['id']
         del annotation['updated']
         del annotation['created']
@@ -376,6 +436,27 @@ class AnnotationListViewTests(BaseAnnotationViewTests):
         response = self._create_annotation(**kwargs)
         self.assertIn('id', response)
 
+    @patch('django.conf.settings.MAX_NOTES_PER_COURSE', 2)
+    def test_create_after_delete_maximum_allowed(self):
+        """
+        Tests that deleting or retiring notes frees room under the maximum allowed notes per course.
+        """
+        first_note = self._create_annotation(text='Foo_1')
+        self._create_annotation(text='Foo_2')
+        self._create_annotation(expected_status=status.HTTP_400_BAD_REQUEST, text='Foo_3')
+
+        url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': first_note['id']})
+        response = self.client.delete(url, self.headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self._create_annotation(text='Foo_3')
+        self._create_annotation(expected_status=status.HTTP_400_BAD_REQUEST, text='Foo_4')
+
+        response = self.client.post(reverse('api:v1:annotations_retire'), data=self.payload)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self._create_annotation(text='Foo_4')
+        self._create_annotation(text='Foo_5')
+        self._create_annotation(expected_status=status.HTTP_400_BAD_REQUEST, text='Foo_6')
+
     def test_read_all_no_annotations(self):
         """
         Tests list all annotations endpoint when no annotations are present in database.
@@ -505,6 +586,14 @@ class AnnotationListViewTests(BaseAnnotationViewTests):
             start=start
         )
 
+    def test_cursor_pagination(self):
+        """
+        Verify that annotations can be listed with cursor pagination.
+        """
+        self.verify_cursor_pagination(
+            reverse('api:v1:annotations'), {'user': TEST_USER, 'course_id': 'test-course-id'}
+        )
+
     def test_delete_all_user_annotations(self, user_id=TEST_USER):
         """
         Verify that deleting all user annotations works
@@ -529,6 +618,25 @@ class AnnotationListViewTests(BaseAnnotationViewTests):
         response = self.client.post(url, headers=self.headers, data=self.payload)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    @patch('django.conf.settings.RETIREMENT_NOTES_BATCH_SIZE', 2)
+    @patch('django.conf.settings.MAX_NOTES_PER_COURSE', 5)
+    def test_delete_all_user_annotations_in_batches(self):
+        """
+        Verify that all annotations are deleted when there are more than a batch of them
+        """
+        for i in range(5):
+            self._create_annotation(text=f'Comment {i}', course_id=f'course-{i % 2}')
+        other_note = Note.create(dict(self.payload, user=TEST_OTHER_USER))
+        other_note.save()
+
+        response = self.client.post(reverse('api:v1:annotations_retire'), data=self.payload)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(list(Note.objects.values_list('id', flat=True)), [other_note.id])
+        # Counters were reset as well.
+        for _ in range(5):
+            self._create_annotation(course_id='course-0')
+
     def test_delete_all_user_annotations_no_user(self):
         """
         Test case where no user is specified when user deletion is requested.
@@ -576,6 +684,469 @@ class AnnotationListViewTests(BaseAnnotationViewTests):
         self.assertEqual(response["total"], 3)
 
 
+class AnnotationBatchViewTests(BaseAnnotationViewTests):
+    """
+    Test creation of several annotations at once.
+    """
+
+    def _create_batch(self, notes, expected_status=status.HTTP_201_CREATED):
+        """
+        Create a batch of annotations
+        """
+        payload = {"user": TEST_USER, "course_id": "test-course-id", "notes": notes}
+        response = self.client.post(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, expected_status)
+        return response
+
+    def _note_payload(self, **kwargs):
+        """
+        Return an annotation of a batch.
+        """
+        note = self.payload.copy()
+        del note['user']
+        del note['course_id']
+        note.update(kwargs)
+        return note
+
+    def test_create_batch(self):
+        """
+        Ensure we can create several notes at once.
+        """
+        notes = [self._note_payload(text=f'Foo_{i}', tags=[f'tag_{i}']) for i in range(3)]
+        response = self._create_batch(notes)
+
+        self.assertEqual(len(response.data), 3)
+        for note, annotation in zip(notes, response.data):
+            self.assertEqual(annotation, self._get_annotation(annotation['id']))
+            for field in ('id', 'created', 'updated'):
+                del annotation[field]
+            self.assertEqual(annotation, dict(note, user=TEST_USER, course_id='test-course-id'))
+
+        self.assertEqual(self.get_annotations()['total'], 3)
+
+    @patch('django.conf.settings.MAX_NOTES_PER_COURSE', 5)
+    def test_create_batch_maximum_allowed(self):
+        """
+        Ensure a batch is rejected as a whole if it would exceed the maximum allowed notes per course.
+        """
+        self._create_annotation()
+        self._create_batch([self._note_payload()] * 3)
+
+        response = self._create_batch([self._note_payload()] * 2, expected_status=status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error_msg', response.data)
+        self.assertEqual(self.get_annotations()['total'], 4)
+
+        self._create_batch([self._note_payload()])
+        self._create_annotation(expected_status=status.HTTP_400_BAD_REQUEST)
+
+    def test_create_batch_invalid(self):
+        """
+        Ensure a batch is rejected as a whole if any of its notes is invalid.
+        """
+        self._create_batch([self._note_payload(), self._note_payload(ranges=[])], status.HTTP_400_BAD_REQUEST)
+        self._create_batch([self._note_payload(), self._note_payload(id=1)], status.HTTP_400_BAD_REQUEST)
+        self._create_batch([], status.HTTP_400_BAD_REQUEST)
+        self._create_batch("not a list", status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_annotations()['total'], 0)
+
+    def test_create_batch_other_user(self):
+        """
+        Ensure notes cannot be created for a user other than the one of the token.
+        """
+        payload = {"user": TEST_OTHER_USER, "course_id": "test-course-id", "notes": [self._note_payload()]}
+        response = self.client.post(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def _delete_batch(self, note_ids, user=TEST_USER, expected_status=status.HTTP_204_NO_CONTENT):
+        """
+        Delete a batch of annotations
+        """
+        payload = {"user": user, "ids": note_ids}
+        response = self.client.delete(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, expected_status)
+        return response
+
+    @patch('django.conf.settings.MAX_NOTES_PER_COURSE', 4)
+    def test_delete_batch(self):
+        """
+        Ensure we can delete several notes at once, and create new ones instead.
+        """
+        note_ids = [note['id'] for note in self._create_batch([self._note_payload()] * 4).data]
+        other_course_id = self._create_annotation(course_id='other-course-id')['id']
+        self._create_annotation(expected_status=status.HTTP_400_BAD_REQUEST)
+
+        self._delete_batch(note_ids[:3] + [other_course_id])
+
+        self.assertEqual(self.get_annotations()['rows'][0]['id'], note_ids[3])
+        self.assertEqual(self.get_annotations({'course_id': 'other-course-id'})['total'], 0)
+        self._create_batch([self._note_payload()] * 3)
+        self._create_annotation(expected_status=status.HTTP_400_BAD_REQUEST)
+
+    def test_delete_batch_ignores_other_notes(self):
+        """
+        Ensure that only existing notes of the user are deleted.
+        """
+        note_id = self._create_annotation()['id']
+        other_note = Note.create(dict(self.payload, user=TEST_OTHER_USER))
+        other_note.save()
+
+        self._delete_batch([note_id, other_note.id, 12345])
+
+        self.assertEqual(self.get_annotations()['total'], 0)
+        self.assertTrue(Note.objects.filter(id=other_note.id).exists())
+        self._delete_batch([note_id])
+
+    def test_delete_batch_invalid(self):
+        """
+        Ensure invalid batches are rejected.
+        """
+        note_id = self._create_annotation()['id']
+        self._delete_batch([note_id, 'foo'], expected_status=status.HTTP_400_BAD_REQUEST)
+        self._delete_batch(note_id, expected_status=status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get_annotations()['total'], 1)
+
+
+class AnnotationConditionalListTests(BaseAnnotationViewTests):
+    """
+    Test conditional requests of the list and usage_id search endpoints.
+    """
+
+    def _get(self, url_name, etag=None, **params):
+        """
+        Send a GET request, with If-None-Match if `etag` is set.
+        """
+        data = {'user': TEST_USER, 'course_id': 'test-course-id', **params}
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse(url_name), data, headers=headers)
+
+    def assert_not_modified(self, url_name, etag, **params):
+        """
+        Assert that the response is HTTP304 when the ETag matches, and return it.
+        """
+        response = self._get(url_name, etag, **params)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        return response
+
+    def test_list(self):
+        response = self._get('api:v1:annotations')
+        self.assertEqual(response.headers['ETag'], '"0"')
+        self.assertNotIn('Last-Modified', response.headers)
+        self.assert_not_modified('api:v1:annotations', '"0"')
+
+        note = self._create_annotation()
+        response = self._get('api:v1:annotations', '"0"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['rows'], [note])
+        etag = response.headers['ETag']
+        updated = parse_datetime(note['updated'])
+        self.assertEqual(etag, f'"1-{updated:%Y%m%d%H%M%S%f}"')
+        self.assertEqual(response.headers['Last-Modified'], http_date(updated.timestamp()))
+
+        with self.assertNumQueries(1):
+            self.assert_not_modified('api:v1:annotations', etag, page_size=1)
+
+        # Deletions change the ETag, even when they do not change the latest update.
+        self._create_annotation()
+        etag = self._get('api:v1:annotations').headers['ETag']
+        response = self.client.delete(
+            reverse('api:v1:annotations_detail', kwargs={'annotation_id': note['id']}), self.headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self._get('api:v1:annotations', etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['total'], 1)
+
+    def test_list_if_modified_since(self):
+        """
+        If-Modified-Since is not enough to tell that the list did not change.
+        """
+        self._create_annotation()
+        last_modified = self._get('api:v1:annotations').headers['Last-Modified']
+        response = self.client.get(
+            reverse('api:v1:annotations'),
+            {'user': TEST_USER, 'course_id': 'test-course-id'},
+            headers={'If-Modified-Since': last_modified},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_search_usage_id(self):
+        note = self._create_annotation()
+        self._create_annotation(usage_id='other-usage-id')
+
+        response = self._get('api:v1:annotations_search', usage_id='test-usage-id')
+        self.assertEqual(response.json(), [note])
+        etag = response.headers['ETag']
+        self.assertEqual(etag, f'"1-{parse_datetime(note["updated"]):%Y%m%d%H%M%S%f}"')
+        self.assert_not_modified('api:v1:annotations_search', etag, usage_id='test-usage-id')
+
+        response = self._get('api:v1:annotations_search', etag, usage_id='other-usage-id')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Paginated searches have no validators.
+        self.assertNotIn('ETag', self._get('api:v1:annotations_search', text='test').headers)
+
+    @override_settings(NOTES_RESPONSE_CACHE_TIMEOUT=60)
+    def test_cached(self):
+        """
+        Validators are cached with the responses.
+        """
+        cache.clear()
+        self._create_annotation()
+        etag = self._get('api:v1:annotations').headers['ETag']
+        with self.assertNumQueries(0):
+            self.assert_not_modified('api:v1:annotations', etag)
+            self.assertEqual(self._get('api:v1:annotations').headers['ETag'], etag)
+
+
+@override_settings(NOTES_RESPONSE_CACHE_TIMEOUT=60)
+class AnnotationResponseCacheTests(BaseAnnotationViewTests):
+    """
+    Test the cache of the responses of the list and search endpoints.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _search_usage_id(self):
+        """
+        Search notes of the test usage id in the test course.
+        """
+        return self._get_search_results(course_id='test-course-id', usage_id='test-usage-id')
+
+    def assert_cached(self):
+        """
+        Assert that the list and search responses are served from the cache once they were requested.
+        """
+        annotations, search_results = self.get_annotations(), self._search_usage_id()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_annotations(), annotations)
+            self.assertEqual(self._search_usage_id(), search_results)
+
+    def test_create(self):
+        self.assertEqual(self.get_annotations()['total'], 0)
+        self.assertEqual(self._search_usage_id(), [])
+        self.assert_cached()
+
+        note = self._create_annotation()
+        self.assertEqual(self.get_annotations()['rows'], [note])
+        self.assertEqual(self._search_usage_id(), [note])
+        self.assert_cached()
+
+    def test_update_and_delete(self):
+        note = self._create_annotation()
+        self.assertEqual(self.get_annotations()['rows'][0]['text'], note['text'])
+        self.assert_cached()
+
+        url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': note['id']})
+        response = self.client.put(url, {'user': TEST_USER, 'text': 'updated', 'tags': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_annotations()['rows'][0]['text'], 'updated')
+        self.assertEqual(self._search_usage_id()[0]['text'], 'updated')
+
+        response = self.client.delete(url, self.headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_annotations()['total'], 0)
+        self.assertEqual(self._search_usage_id(), [])
+
+    def test_batches_and_retirement(self):
+        payload = {'user': TEST_USER, 'course_id': 'test-course-id', 'notes': [self.payload, self.payload]}
+        response = self.client.post(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.get_annotations()['total'], 2)
+        self.assert_cached()
+
+        payload = {'user': TEST_USER, 'ids': [response.data[0]['id']]}
+        response = self.client.delete(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_annotations()['total'], 1)
+        self.assert_cached()
+
+        response = self.client.post(reverse('api:v1:annotations_retire'), {'user': TEST_USER})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.get_annotations()['total'], 0)
+        self.assertEqual(self._search_usage_id(), [])
+
+    def test_query_parameters(self):
+        for _ in range(3):
+            self._create_annotation()
+        self.assertEqual(len(self.get_annotations({'page_size': 2})['rows']), 2)
+        self.assertEqual(len(self.get_annotations({'page_size': 2, 'page': 2})['rows']), 1)
+        self.assertEqual(self.get_annotations({'course_id': 'other-course-id'})['total'], 0)
+
+    def test_evicted_versions(self):
+        """
+        Cached responses are not served again when the versions were evicted from the cache.
+        """
+        self.assertEqual(self.get_annotations()['total'], 0)
+        Note.create(self.payload).save()
+        # pylint: disable=protected-access
+        cache.delete_many([
+            response_cache._user_version_key(TEST_USER),
+            response_cache._course_version_key(TEST_USER, 'test-course-id'),
+        ])
+        self.assertEqual(self.get_annotations()['total'], 1)
+
+
+@override_settings(NOTES_USAGE_SEARCH_CACHE_TIMEOUT=60)
+class AnnotationUsageSearchCacheTests(BaseAnnotationViewTests):
+    """
+    Test the cache of the rendered responses of usage id searches.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def _search(self, *usage_ids, etag=None):
+        """
+        Search notes of some usage ids in the test course, and return the response.
+        """
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(
+            reverse('api:v1:annotations_search'),
+            {'user': TEST_USER, 'course_id': 'test-course-id', 'usage_id': list(usage_ids)},
+            headers=headers,
+        )
+
+    def assert_cached(self, *usage_ids):
+        """
+        Assert that the search is served from the cache, without queries nor rendering, and return its results.
+        """
+        with self.assertNumQueries(0), patch('notesapi.v1.views.common.NotesJSONRenderer.render') as render:
+            response = self._search(*usage_ids)
+        render.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response.json()
+
+    def test_cached(self):
+        note = self._create_annotation()
+        response = self._search('test-usage-id', 'other-usage-id')
+        self.assertEqual(response.json(), [note])
+        self.assertEqual(self.assert_cached('test-usage-id', 'other-usage-id'), [note])
+
+        etag = response.headers['ETag']
+        with self.assertNumQueries(0):
+            response = self._search('test-usage-id', 'other-usage-id', etag=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers['ETag'], etag)
+
+    def test_invalidated_by_usage_id(self):
+        """
+        Only the searches of the usage id of a note that changed are invalidated.
+        """
+        note = self._create_annotation()
+        self.assertEqual(self._search('test-usage-id').json(), [note])
+        self.assertEqual(self._search('other-usage-id').json(), [])
+
+        other_note = self._create_annotation(usage_id='other-usage-id')
+        self.assertEqual(self.assert_cached('test-usage-id'), [note])
+        self.assertEqual(self._search('other-usage-id').json(), [other_note])
+        self.assertEqual(self.assert_cached('other-usage-id'), [other_note])
+
+        url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': note['id']})
+        response = self.client.put(url, {'user': TEST_USER, 'text': 'updated', 'tags': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._search('test-usage-id').json()[0]['text'], 'updated')
+        self.assertEqual(self.assert_cached('other-usage-id'), [other_note])
+
+        response = self.client.delete(url, self.headers)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._search('test-usage-id').json(), [])
+
+    def test_batches_and_retirement(self):
+        self.assertEqual(self._search('test-usage-id').json(), [])
+        self.assertEqual(self._search('other-usage-id').json(), [])
+
+        payload = {'user': TEST_USER, 'course_id': 'test-course-id', 'notes': [self.payload]}
+        response = self.client.post(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._search('test-usage-id').json(), response.json())
+        self.assertEqual(self.assert_cached('other-usage-id'), [])
+
+        payload = {'user': TEST_USER, 'ids': [response.json()[0]['id']]}
+        response = self.client.delete(reverse('api:v1:annotations_batch'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._search('test-usage-id').json(), [])
+
+        self._create_annotation()
+        self.assertEqual(len(self._search('test-usage-id').json()), 1)
+        response = self.client.post(reverse('api:v1:annotations_retire'), {'user': TEST_USER})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self._search('test-usage-id').json(), [])
+
+    def test_indented(self):
+        """
+        Rendered responses are cached per media type.
+        """
+        note = self._create_annotation()
+        self.assertEqual(self._search('test-usage-id').json(), [note])
+        response = self.client.get(
+            reverse('api:v1:annotations_search'),
+            {'user': TEST_USER, 'course_id': 'test-course-id', 'usage_id': 'test-usage-id'},
+            headers={'Accept': 'application/json; indent=2'},
+        )
+        self.assertIn(b'\n  {', response.content)
+        self.assertEqual(response.json(), [note])
+
+
+@override_settings(NOTES_COUNT_CACHE_TIMEOUT=60)
+class AnnotationCountTests(BaseAnnotationViewTests):
+    """
+    Test the cache of the numbers of notes of numbered pages, and pages without them.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        for _ in range(3):
+            self._create_annotation()
+
+    def test_cached_count(self):
+        self.assertEqual(self.get_annotations({'page_size': 2})['total'], 3)
+        # The ETag and the page are queried, not the number of notes.
+        with self.assertNumQueries(2):
+            response = self.get_annotations({'page_size': 2, 'page': 2})
+        self.assertEqual((response['total'], response['num_pages'], len(response['rows'])), (3, 2, 1))
+
+        self._create_annotation()
+        self.assertEqual(self.get_annotations({'page_size': 2, 'page': 2})['total'], 4)
+        self.assertEqual(self.get_annotations({'course_id': 'other-course-id'})['total'], 0)
+
+    def test_cached_search_count(self):
+        self.assertEqual(self._get_search_results(course_id='test-course-id', page_size=2)['total'], 3)
+        self.assertEqual(self._get_search_results(course_id='test-course-id', text='other')['total'], 0)
+        with self.assertNumQueries(1):
+            response = self._get_search_results(course_id='test-course-id', page_size=2, page=2)
+        self.assertEqual(response['total'], 3)
+
+        self._create_annotation(text='other')
+        self.assertEqual(self._get_search_results(course_id='test-course-id', page_size=2)['total'], 4)
+        self.assertEqual(self._get_search_results(course_id='test-course-id', text='other')['total'], 1)
+
+    def test_without_count(self):
+        with self.assertNumQueries(2):
+            response = self.get_annotations({'page_size': 2, 'count': 'false'})
+        self.assertNotIn('total', response)
+        self.assertNotIn('num_pages', response)
+        self.assertEqual(len(response['rows']), 2)
+        self.assertIsNone(response['previous'])
+
+        response = self.client.get(response['next'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = response.json()
+        self.assertEqual((response['current_page'], response['start'], len(response['rows'])), (2, 2, 1))
+        self.assertIsNone(response['next'])
+        self.assertIn('page_size=2', response['previous'])
+
+        self.get_annotations({'page_size': 2, 'page': 3, 'count': 'false'}, expected_status=404)
+        self.get_annotations({'page': 0, 'count': 'false'}, expected_status=404)
+        self.assertNotIn('total', self._get_search_results(course_id='test-course-id', count='false'))
+
+
 @ddt.ddt
 class AnnotationDetailViewTests(BaseAnnotationViewTests):
     """
@@ -591,7 +1162,7 @@ class AnnotationDetailViewTests(BaseAnnotationViewTests):
         response = self.client.get(url, self.headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-        annotation = response.data
+        annotation = response.json()
         self.assertEqual(type(annotation['id']), str)
         del annotation['id']
         del annotation['updated']
@@ -606,6 +1177,58 @@ class AnnotationDetailViewTests(BaseAnnotationViewTests):
         response = self.client.get(url, self.headers)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, "response should be 404 NOT FOUND")
 
+    def test_read_if_none_match(self):
+        """
+        Ensure that an annotation that did not change is not sent again.
+        """
+        note_id = self._create_annotation()['id']
+        url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': note_id})
+        response = self.client.get(url, self.headers)
+        etag = response.headers['ETag']
+        self.assertEqual(etag, f'"{note_id}-{parse_datetime(response.json()["updated"]):%Y%m%d%H%M%S%f}"')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, self.headers, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get(url, self.headers, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['id'], note_id)
+
+        response = self.client.put(url, {'user': TEST_USER, 'text': 'Bar', 'tags': []}, format='json')
+        self.assertNotEqual(response.headers['ETag'], etag)
+        response = self.client.get(url, self.headers, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['text'], 'Bar')
+
+        url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': 123})
+        response = self.client.get(url, self.headers, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_and_delete_if_match(self):
+        """
+        Ensure that an annotation is not updated or deleted if it changed since it was read.
+        """
+        note_id = self._create_annotation()['id']
+        url = reverse('api:v1:annotations_detail', kwargs={'annotation_id': note_id})
+        etag = self.client.get(url, self.headers).headers['ETag']
+        payload = {'user': TEST_USER, 'text': 'Bar', 'tags': []}
+
+        response = self.client.put(url, payload, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_etag = response.headers['ETag']
+
+        response = self.client.put(url, dict(payload, text='Baz'), format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.delete(url, self.headers, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(self._get_annotation(note_id)['text'], 'Bar')
+
+        response = self.client.delete(url, self.headers, HTTP_IF_MATCH=new_etag)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
     def test_update(self):
         """
         Ensure we can update an existing annotation.
@@ -1032,6 +1655,18 @@ class AnnotationSearchViewTests(BaseAnnotationViewTests):
         self.assertEqual(results['total'], 3)
         self._has_text(results['rows'], ['A great comment', 'Another comment', 'Not as good'])
 
+    def test_search_non_ascii_tag_in_db(self):
+        """
+        Database searches find tags with non-ASCII characters, whatever the JSON encoding of the database.
+        """
+        self._create_annotation(text="Un commentaire", tags=["café", "thé"])
+        self._create_annotation(text="Another comment", tags=["coffee"])
+
+        view = DatabaseAnnotationSearchView()
+        view.params = {"text": "café"}
+        view.query_params = {"user_id": TEST_USER}
+        self.assertEqual([note.text for note in view.get_queryset()], ["Un commentaire"])
+
     def _has_text(self, rows, expected):
         """
         Tests that the set of expected text is exactly the text in rows, ignoring order.
@@ -1149,6 +1784,14 @@ class AnnotationSearchViewTests(BaseAnnotationViewTests):
             start=start
         )
 
+    def test_cursor_pagination(self):
+        """
+        Verify that search results can be listed with cursor pagination.
+        """
+        self.verify_cursor_pagination(
+            reverse('api:v1:annotations_search'), {'user': TEST_USER, 'course_id': 'test-course-id'}
+        )
+
     @ddt.unpack
     @ddt.data(
         {"text": "Ammar محمد عمار Muhammad", "search": "محمد عمار", "tags": ["عمار", "Muhammad", "محمد"]},
@@ -1268,6 +1911,44 @@ class TokenTests(BaseAnnotationViewTests):
         token = jwt.encode(self.token_data, "some secret")
         self._assert_403(token)
 
+    def test_validated_token_cache(self):
+        """
+        Tokens are validated once until they expire, and cached tokens are still checked against the user.
+        """
+        validated_tokens.clear()
+        self.headers["course_id"] = "test-course-id"
+        with patch('notesapi.v1.permissions.jwt.decode', wraps=jwt.decode) as decode:
+            for _ in range(3):
+                response = self.client.get(self.url, self.headers)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(decode.call_count, 1)
+            self.assertEqual(validated_tokens.stats(), {"hits": 2, "misses": 1, "size": 1})
+
+            response = self.client.get(self.url, dict(self.headers, user=TEST_OTHER_USER))
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+            with patch('notesapi.v1.caching.time.monotonic', return_value=time.monotonic() + 3600):
+                self.client.get(self.url, self.headers)
+            self.assertEqual(decode.call_count, 2)
+
+        with override_settings(CLIENT_SECRET="other secret"):
+            response = self.client.get(self.url, self.headers)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_validated_token_cache_size(self):
+        """
+        The least recently used tokens are evicted from the cache.
+        """
+        token_cache = ValidatedTokenCache(2)
+        for token in ("a", "b", "c"):
+            token_cache.set(token, token, time.time() + 60)
+        self.assertIsNone(token_cache.get("a"))
+        self.assertEqual(token_cache.get("b"), "b")
+        token_cache.set("d", "d", time.time() + 60)
+        self.assertIsNone(token_cache.get("c"))
+        self.assertEqual(token_cache.get("b"), "b")
+        self.assertEqual(token_cache.stats(), {"hits": 2, "misses": 2, "size": 2})
+
     def test_multifield_user(self):
         """
         403 when user in GET matches token, but in POST does not
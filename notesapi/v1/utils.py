@@ -14,22 +14,30 @@ class NotesPaginatorMixin:
 
     page_size = settings.DEFAULT_NOTES_PAGE_SIZE
     page_size_query_param = "page_size"
+    count_query_param = "count"
+
+    def is_count_requested(self, request):
+        """
+        Return whether the response includes the number of notes. Clients that only follow the "next" links
+        can skip it with count=false.
+        """
+        return request.query_params.get(self.count_query_param, "").lower() not in ("false", "0")
 
     def get_paginated_response(self, data):
         """
         Annotate the response with pagination information.
         """
-        return Response(
-            {
-                'start': (self.page.number - 1) * self.get_page_size(self.request),
-                'current_page': self.page.number,
-                'next': self.get_next_link(),
-                'previous': self.get_previous_link(),
-                'total': self.page.paginator.count,
-                'num_pages': self.page.paginator.num_pages,
-                'rows': data,
-            }
-        )
+        response = {
+            'start': (self.page.number - 1) * self.get_page_size(self.request),
+            'current_page': self.page.number,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.is_count_requested(self.request):
+            response['total'] = self.page.paginator.count
+            response['num_pages'] = self.page.paginator.num_pages
+        response['rows'] = data
+        return Response(response)
 
 
 def dict_to_querydict(dict_):
@@ -2,6 +2,7 @@ import typing as t
 from django.conf import settings
 
 from .common import (
+    AnnotationBatchView,
     AnnotationDetailView,
     AnnotationListView,
     AnnotationRetireView,
@@ -1,19 +1,38 @@
 import json
 import logging
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Max, Q, QuerySet
+from django.http import HttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.utils.translation import gettext as _
 from edx_django_utils.monitoring import set_custom_attribute
 from rest_framework import status
 from rest_framework.generics import GenericAPIView, ListAPIView
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 
-from notesapi.v1.models import Note
-from notesapi.v1.serializers import NoteSerializer
+from notesapi.v1 import membership, response_cache
+from notesapi.v1.db_routers import read_from_primary, read_from_replica, record_write
+from notesapi.v1.models import Note, NoteCounter
+from notesapi.v1.paginators import NotesCursorPaginator
+from notesapi.v1.renderers import NotesJSONRenderer
+from notesapi.v1.serializers import (
+    NOTE_ROW_FIELDS,
+    ROW_ID_INDEX,
+    ROW_UPDATED_INDEX,
+    NoteSerializer,
+    serialize_note_row,
+    serialize_note_rows,
+)
 
 
 log = logging.getLogger(__name__)
@@ -25,6 +44,24 @@ class AnnotationsLimitReachedError(Exception):
     """
 
 
+def limit_reached_response():
+    """
+    Response to a request that would exceed the maximum number of notes per course.
+    """
+    error_message = _(
+        "You can create up to {max_num_annotations_per_course} notes."
+        " You must remove some notes before you can add new ones."
+    ).format(max_num_annotations_per_course=settings.MAX_NOTES_PER_COURSE)
+    log.info(
+        "Attempted to create more than %s annotations",
+        settings.MAX_NOTES_PER_COURSE,
+    )
+
+    return Response(
+        {"error_msg": error_message}, status=status.HTTP_400_BAD_REQUEST
+    )
+
+
 class AnnotationSearchView(ListAPIView):
     """
     **Use Case**
@@ -38,6 +75,13 @@ class AnnotationSearchView(ListAPIView):
             Each page in the list contains 25 annotations by default. The page
             size can be altered by passing parameter "page_size=<page_size>".
 
+            Pages are numbered by default. Passing the "cursor" parameter, empty for the
+            first page, switches to cursor pagination, which skips counting the annotations.
+            It is not available for ElasticSearch and Meilisearch text searches.
+
+            Responses of usage_id based searches in the database have ETag and Last-Modified
+            headers, and support If-None-Match like the list of annotations.
+
             Http400 is returned if the format of the request is not correct.
 
     **Search Types**
@@ -69,6 +113,10 @@ class AnnotationSearchView(ListAPIView):
 
         * text: Student's thoughts on the quote
 
+        * cursor: Position of the page, as found in the "next" and "previous" links.
+
+        * count: "false" to skip counting the annotations of numbered pages.
+
         * highlight: dict. Only used when search from ElasticSearch. It contains two keys:
 
             * highlight_tag: String. HTML tag to be used for highlighting the text. Default is "em"
@@ -87,6 +135,10 @@ class AnnotationSearchView(ListAPIView):
 
         * num_pages: The number of pages listing annotations.
 
+        * With cursor pagination, only next, previous and the list of annotations are returned.
+
+        * With count=false, count and num_pages are not returned.
+
         * results: A list of annotations returned. Each collection in the list contains these fields.
 
             * id: String. The primary key of the note.
@@ -110,6 +162,7 @@ class AnnotationSearchView(ListAPIView):
             * updated: DateTime. When was the last time annotation was updated.
     """
 
+    renderer_classes = [NotesJSONRenderer]
     action = ""
     params = {}
     query_params = {}
@@ -126,11 +179,19 @@ class AnnotationSearchView(ListAPIView):
         return "text" in self.params
 
     def get_queryset(self):
+        if "user" in self.params and "course_id" in self.params:
+            if not membership.has_notes(self.params["user"], self.params["course_id"]):
+                # Most users have no notes: their empty results are sent without querying them.
+                return Note.objects.none()
+
         queryset = Note.objects.filter(**self.query_params).order_by("-updated")
         if "text" in self.params:
-            qs_filter = Q(text__icontains=self.params["text"]) | Q(
-                tags__icontains=self.params["text"]
-            )
+            text = self.params["text"]
+            qs_filter = Q(text__icontains=text) | Q(tags__icontains=text)
+            # Tags are matched in their JSON, where some databases, such as SQLite, escape non-ASCII characters.
+            escaped_text = json.dumps(text)[1:-1]
+            if escaped_text != text:
+                qs_filter |= Q(tags__icontains=escaped_text)
             queryset = queryset.filter(qs_filter)
         return queryset
 
@@ -142,6 +203,23 @@ class AnnotationSearchView(ListAPIView):
         """
         return NoteSerializer
 
+    @property
+    def is_cursor_pagination(self):
+        """
+        Cursor pagination is requested with the "cursor" parameter. Subclasses that do not
+        search in the database may not support it.
+        """
+        return NotesCursorPaginator.cursor_query_param in self.params
+
+    @property
+    def pagination_class(self):
+        """
+        Return the class to use for the paginator.
+        """
+        if self.is_cursor_pagination:
+            return NotesCursorPaginator
+        return api_settings.DEFAULT_PAGINATION_CLASS
+
     @property
     def paginator(self):
         """
@@ -171,16 +249,60 @@ class AnnotationSearchView(ListAPIView):
         """
         return []
 
+    @property
+    def is_response_cacheable(self):
+        """
+        Responses of searches in the database are cached per user and course. Subclasses that
+        search in an index which is updated asynchronously must not cache them.
+        """
+        return "user" in self.params and "course_id" in self.params
+
     def list(self, *args, **kwargs):
         """
         Returns list of students notes.
         """
+        if not self.is_response_cacheable:
+            return self.list_notes()
+
+        if self.search_with_usage_id:
+            return conditional_notes_response(
+                self.request,
+                self.params["user"],
+                self.params["course_id"],
+                self.filter_queryset(self.get_queryset()),
+                lambda: self.list_notes().data,
+                usage_ids=self.query_params["usage_id__in"],
+            )
+
+        data = response_cache.get_or_set(
+            self.request, self.params["user"], self.params["course_id"], lambda: self.list_notes().data
+        )
+        return Response(data, status=status.HTTP_200_OK)
+
+    def list_notes(self):
+        """
+        Search notes and return the response.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        from_database = isinstance(queryset, QuerySet)
+        if from_database:
+            # Notes found in the database skip model instantiation and the model serializer.
+            queryset = queryset.values_list(*NOTE_ROW_FIELDS)
+
         # Do not send paginated result if usage id based search.
         if self.search_with_usage_id:
-            queryset = self.filter_queryset(self.get_queryset())
-            serializer = self.get_serializer(queryset, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return super().list(*args, **kwargs)
+            return Response(self.serialize_notes(queryset, from_database), status=status.HTTP_200_OK)
+
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.serialize_notes(page, from_database))
+
+    def serialize_notes(self, notes, from_database):
+        """
+        Serialize database rows or search engine results.
+        """
+        if from_database:
+            return serialize_note_rows(notes)
+        return self.get_serializer(notes, many=True).data
 
     def build_query_params_state(self):
         """
@@ -208,7 +330,78 @@ class AnnotationSearchView(ListAPIView):
         self.search_with_usage_id = False
         self.build_query_params_state()
 
-        return super().get(*args, **kwargs)
+        with read_from_replica(self.params.get("user")):
+            return super().get(*args, **kwargs)
+
+    @classmethod
+    def index_notes(cls, notes):
+        """
+        Add or update notes in the search index, in a single request.
+
+        Notes that are saved one by one are indexed by signals: this is meant for
+        bulk operations that do not send them. Call it in the transaction that saves the
+        notes: the request is sent once it is committed. No-op.
+        """
+        return
+
+    @classmethod
+    def delete_notes(cls, note_ids):
+        """
+        Remove notes from the search index, in a single request.
+
+        Like `index_notes`, this is meant for bulk operations that do not send signals, and is
+        called in the transaction that deletes the notes. No-op.
+        """
+        return
+
+    @classmethod
+    def delete_user_notes(cls, user_id):
+        """
+        Remove all notes of a user from the search index, in a single request. No-op.
+        """
+        return
+
+    @classmethod
+    def get_indexed_note_ids(cls, batch_size=1000):
+        """
+        Return an iterable of the ids of all notes of the search index, fetched by batches of `batch_size`.
+        None.
+        """
+        return []
+
+    @classmethod
+    def sync_notes(cls, since, batch_size=1000, on_progress=None):
+        """
+        Index the notes updated since a date, and remove the documents of the search index whose notes no
+        longer exist, by batches of `batch_size` notes.
+
+        This recovers the notes the search index missed, such as during an outage of its backend. All
+        documents are checked for deletion, since notes deleted during the outage were last updated before
+        it. `on_progress(indexed, deleted)` is called after each batch. Return the numbers of indexed and
+        deleted notes.
+        """
+        indexed = deleted = 0
+        last_id = 0
+        while True:
+            # Batches of primary keys, without OFFSET.
+            notes = list(Note.objects.filter(updated__gte=since, id__gt=last_id).order_by("id")[:batch_size])
+            if not notes:
+                break
+            cls.index_notes(notes)
+            indexed += len(notes)
+            last_id = notes[-1].id
+            if on_progress:
+                on_progress(indexed, deleted)
+
+        document_ids = iter(cls.get_indexed_note_ids(batch_size))
+        while document_ids_batch := list(islice(document_ids, batch_size)):
+            missing_ids = missing_note_ids(document_ids_batch)
+            if missing_ids:
+                cls.delete_notes(missing_ids)
+            deleted += len(missing_ids)
+            if on_progress:
+                on_progress(indexed, deleted)
+        return indexed, deleted
 
     @classmethod
     def selftest(cls):
@@ -230,15 +423,37 @@ class AnnotationRetireView(GenericAPIView):
     Administrative functions for the notes service.
     """
 
+    # Search view of the active backend, which removes the deleted notes from the index. Set in urls.py.
+    search_view_class = AnnotationSearchView
+
     def post(self, *args, **kwargs):
         """
         Delete all annotations for a user.
+
+        Annotations are deleted in batches of `RETIREMENT_NOTES_BATCH_SIZE`, each one in its own
+        transaction, so that row locks are held briefly. Then they are removed from the search index
+        with a single request.
         """
         params = self.request.data
         if "user" not in params:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        Note.objects.filter(user_id=params["user"]).delete()
+        user_id = params["user"]
+        while True:
+            with transaction.atomic():
+                note_ids = list(
+                    Note.objects.select_for_update().filter(user_id=user_id).order_by("id").values_list(
+                        "id", flat=True
+                    )[:settings.RETIREMENT_NOTES_BATCH_SIZE]
+                )
+                if not note_ids:
+                    break
+                delete_notes(note_ids)
+        NoteCounter.objects.filter(user_id=user_id).delete()
+        record_write(user_id)
+        response_cache.invalidate(user_id)
+
+        self.search_view_class.delete_user_notes(user_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -253,6 +468,13 @@ class AnnotationListView(GenericAPIView):
             Each page in the list contains 25 annotations by default. The page
             size can be altered by passing parameter "page_size=<page_size>".
 
+            Pages are numbered by default. Passing the "cursor" parameter, empty for the
+            first page, switches to cursor pagination, which skips counting the annotations.
+
+            Responses have ETag and Last-Modified headers. HTTP 304 Not Modified is returned
+            if the annotations of the user in the course did not change since the ETag sent in
+            the If-None-Match header.
+
             HTTP 400 Bad Request: The format of the request is not correct.
 
         * Create a new annotation for a user.
@@ -286,6 +508,10 @@ class AnnotationListView(GenericAPIView):
 
         * user: Anonymized user id.
 
+        * cursor: Optional. Position of the page, as found in the "next" and "previous" links.
+
+        * count: Optional. "false" to skip counting the annotations of numbered pages.
+
     **Response Values for GET**
 
         * count: The number of annotations in a course.
@@ -298,6 +524,10 @@ class AnnotationListView(GenericAPIView):
 
         * num_pages: The number of pages listing annotations.
 
+        * With cursor pagination, only next, previous and the list of annotations are returned.
+
+        * With count=false, count and num_pages are not returned.
+
         * results:  A list of annotations returned. Each collection in the list contains these fields.
 
             * id: String. The primary key of the note.
@@ -357,6 +587,16 @@ class AnnotationListView(GenericAPIView):
     """
 
     serializer_class = NoteSerializer
+    renderer_classes = [NotesJSONRenderer]
+
+    @property
+    def pagination_class(self):
+        """
+        Return the class to use for the paginator.
+        """
+        if NotesCursorPaginator.cursor_query_param in self.request.query_params:
+            return NotesCursorPaginator
+        return api_settings.DEFAULT_PAGINATION_CLASS
 
     def get(self, *args, **kwargs):
         """
@@ -370,13 +610,17 @@ class AnnotationListView(GenericAPIView):
         if "user" not in params:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        notes = Note.objects.filter(
-            course_id=params["course_id"], user_id=params["user"]
-        ).order_by("-updated")
-        page = self.paginate_queryset(notes)
-        serializer = self.get_serializer(page, many=True)
-        response = self.get_paginated_response(serializer.data)
-        return response
+        def get_data():
+            page = self.paginate_queryset(notes.order_by("-updated").values_list(*NOTE_ROW_FIELDS))
+            return self.get_paginated_response(serialize_note_rows(page)).data
+
+        with read_from_replica(params["user"]):
+            if membership.has_notes(params["user"], params["course_id"]):
+                notes = Note.objects.filter(course_id=params["course_id"], user_id=params["user"])
+            else:
+                # Most users have no notes: their empty list is sent without querying them.
+                notes = Note.objects.none()
+            return conditional_notes_response(self.request, params["user"], params["course_id"], notes, get_data)
 
     def post(self, *args, **kwargs):
         """
@@ -388,35 +632,24 @@ class AnnotationListView(GenericAPIView):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            total_notes = Note.objects.filter(
-                user_id=self.request.data["user"],
-                course_id=self.request.data["course_id"],
-            ).count()
-            if total_notes >= settings.MAX_NOTES_PER_COURSE:
-                raise AnnotationsLimitReachedError
-
             note = Note.create(self.request.data)
             note.full_clean()
 
-            set_custom_attribute("notes.count", total_notes)
+            with transaction.atomic():
+                total_notes = NoteCounter.increment(note.user_id, note.course_id, limit=settings.MAX_NOTES_PER_COURSE)
+                if total_notes is None:
+                    raise AnnotationsLimitReachedError
+                membership.record_notes(note.user_id, note.course_id)
+                note.save()
+            # Number of notes the user had in the course before this one.
+            set_custom_attribute("notes.count", total_notes - 1)
+            record_write(note.user_id)
+            response_cache.invalidate(note.user_id, note.course_id, [note.usage_id])
         except ValidationError as error:
             log.debug(error, exc_info=True)
             return Response(status=status.HTTP_400_BAD_REQUEST)
         except AnnotationsLimitReachedError:
-            error_message = _(
-                "You can create up to {max_num_annotations_per_course} notes."
-                " You must remove some notes before you can add new ones."
-            ).format(max_num_annotations_per_course=settings.MAX_NOTES_PER_COURSE)
-            log.info(
-                "Attempted to create more than %s annotations",
-                settings.MAX_NOTES_PER_COURSE,
-            )
-
-            return Response(
-                {"error_msg": error_message}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        note.save()
+            return limit_reached_response()
 
         location = reverse(
             "api:v1:annotations_detail", kwargs={"annotation_id": note.id}
@@ -429,6 +662,250 @@ class AnnotationListView(GenericAPIView):
         )
 
 
+class AnnotationBatchView(GenericAPIView):
+    """
+    **Use Case**
+
+        * Create several annotations of a user in a course at once.
+
+            All annotations are validated first: if any of them is invalid, or if they would
+            exceed the maximum number of notes for the user in the course, none is created.
+
+            HTTP 400 Bad Request: The format of the request is not correct, or the maximum number of notes for a
+            user has been reached.
+
+            HTTP 201 Created: Success.
+
+        * Delete several annotations of a user at once.
+
+            Ids of annotations that do not exist or that belong to another user are ignored.
+
+            HTTP 400 Bad Request: The format of the request is not correct.
+
+            HTTP 204 No Content: Success.
+
+    **Example Requests**
+
+        POST /api/v1/annotations/batch/
+        {"user": {user_id}, "course_id": {course_id}, "notes": [{"usage_id": {usage_id}, "ranges": {ranges}, ...}]}
+
+        DELETE /api/v1/annotations/batch/
+        {"user": {user_id}, "ids": [{annotation_id}, ...]}
+
+    **JSON data for POST**
+
+        * user: Anonymized user id.
+
+        * course_id: Id of the course.
+
+        * notes: List of annotations. Each one has the same fields as an annotation created with
+          POST /api/v1/annotations/, without user and course_id.
+
+    **Response Values for POST**
+
+        * A list of the created annotations, in the same order and with the same fields as in the
+          response of POST /api/v1/annotations/.
+
+    **JSON data for DELETE**
+
+        * user: Anonymized user id.
+
+        * ids: List of ids of the annotations to delete.
+    """
+
+    renderer_classes = [NotesJSONRenderer]
+    # Search view of the active backend, which indexes the created and deleted notes. Set in urls.py.
+    search_view_class = AnnotationSearchView
+
+    def post(self, *args, **kwargs):
+        """
+        Create new annotations.
+        """
+        params = self.request.data
+        if not isinstance(params, dict) or not isinstance(params.get("notes"), list) or not params["notes"]:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            notes = []
+            for note_dict in params["notes"]:
+                if not isinstance(note_dict, dict) or "id" in note_dict:
+                    raise ValidationError("Note must be a dictionary without id.")
+                note = Note.create(dict(note_dict, user=params.get("user"), course_id=params.get("course_id")))
+                note.full_clean()
+                notes.append(note)
+
+            with transaction.atomic():
+                if NoteCounter.increment(
+                    notes[0].user_id, notes[0].course_id, amount=len(notes), limit=settings.MAX_NOTES_PER_COURSE
+                ) is None:
+                    raise AnnotationsLimitReachedError
+                membership.record_notes(notes[0].user_id, notes[0].course_id)
+                notes = bulk_create_notes(notes)
+                self.search_view_class.index_notes(notes)
+            record_write(notes[0].user_id)
+            response_cache.invalidate(notes[0].user_id, notes[0].course_id, {note.usage_id for note in notes})
+        except ValidationError as error:
+            log.debug(error, exc_info=True)
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        except AnnotationsLimitReachedError:
+            return limit_reached_response()
+
+        serializer = NoteSerializer(notes, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete annotations.
+        """
+        params = self.request.data
+        if not isinstance(params, dict) or not params.get("user") or not isinstance(params.get("ids"), list):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        try:
+            note_ids = [int(note_id) for note_id in params["ids"]]
+        except (TypeError, ValueError):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = params["user"]
+        with transaction.atomic():
+            # Lock the notes, so that concurrent requests do not decrement the counters twice.
+            deleted = list(
+                Note.objects.select_for_update().filter(user_id=user_id, id__in=note_ids).values_list(
+                    "id", "course_id", "usage_id"
+                )
+            )
+            if deleted:
+                delete_notes([note_id for note_id, _, _ in deleted])
+                self.search_view_class.delete_notes([note_id for note_id, _, _ in deleted])
+                for course_id, count in Counter(course_id for _, course_id, _ in deleted).items():
+                    NoteCounter.decrement(user_id, course_id, amount=count)
+                    response_cache.invalidate(
+                        user_id,
+                        course_id,
+                        {usage_id for _, note_course_id, usage_id in deleted if note_course_id == course_id},
+                    )
+
+        if deleted:
+            record_write(user_id)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def notes_validators(notes):
+    """
+    Return the ETag and the last modification datetime of a queryset of notes, with one aggregate query.
+
+    The ETag changes whenever a note is created, updated or deleted.
+    """
+    aggregate = notes.aggregate(count=Count("id"), last_modified=Max("updated"))
+    last_modified = aggregate["last_modified"]
+    if last_modified is None:
+        return quote_etag("0"), None
+    return quote_etag(f"{aggregate['count']}-{last_modified:%Y%m%d%H%M%S%f}"), last_modified
+
+
+def conditional_notes_response(request, user_id, course_id, notes, get_data, *, usage_ids=None):
+    """
+    Return the response of a list of notes with ETag and Last-Modified headers, or HTTP304 if the client
+    already has it.
+
+    `notes` is the queryset of all the notes of the list, and `get_data()` returns the response data.
+    Both the data and the validators are stored in the response cache. Responses of searches in
+    `usage_ids` are stored rendered in the usage search cache instead, if it is enabled, so that they
+    are sent without serializing them again.
+
+    Only If-None-Match is evaluated: If-Modified-Since would miss deletions, and updates within the
+    same second.
+    """
+    prerendered = usage_ids is not None and response_cache.is_usage_search_enabled()
+    if prerendered:
+        cache = response_cache.usage_searches
+        key = response_cache.usage_search_key(request, user_id, course_id, usage_ids)
+    else:
+        cache = response_cache.responses
+        key = response_cache.response_key(request, user_id, course_id)
+
+    cached = None if key is None else cache.get(key)
+    # Data that is cached is read from the primary, so that it is never older than its version.
+    reads = nullcontext if key is None else read_from_primary
+    if cached is None:
+        # The validators are computed first, so that they are never newer than the data.
+        with reads():
+            etag, last_modified = notes_validators(notes)
+    else:
+        etag, last_modified, data = cached
+
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified.timestamp())
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified.headers[name] = value
+        return not_modified
+
+    if cached is None:
+        with reads():
+            data = get_data()
+        if prerendered:
+            data = request.accepted_renderer.render(data, request.accepted_media_type)
+        if key is not None:
+            cache.set(key, (etag, last_modified, data))
+    if prerendered:
+        return HttpResponse(data, content_type=request.accepted_renderer.media_type, headers=headers)
+    return Response(data, headers=headers)
+
+
+def note_etag(note_id, updated):
+    """
+    Return the strong ETag of a version of a note.
+    """
+    return quote_etag(f"{note_id}-{updated:%Y%m%d%H%M%S%f}")
+
+
+def missing_note_ids(note_ids):
+    """
+    Return the ids of `note_ids` whose notes do not exist, such as those of stale documents of a search index.
+    """
+    existing_ids = set(Note.objects.filter(id__in=note_ids).values_list("id", flat=True))
+    return [note_id for note_id in note_ids if note_id not in existing_ids]
+
+
+def delete_notes(note_ids):
+    """
+    Delete notes with a single query.
+
+    Unlike `QuerySet.delete`, this does not fetch the notes to send deletion signals: their
+    documents must be removed from the search index by the caller.
+    """
+    queryset = Note.objects.filter(id__in=note_ids)
+    # `_raw_delete` is the single DELETE that `QuerySet.delete` itself runs when it can skip fetching rows.
+    # It is safe here because no model has a relation to notes, so there is nothing to cascade, and because
+    # callers delete the documents in bulk: `.delete()` would send a deletion signal per note, which the search
+    # backends handle with one request each. A test checks that notes have no related objects.
+    return queryset._raw_delete(queryset.db)  # pylint: disable=protected-access
+
+
+def bulk_create_notes(notes):
+    """
+    Insert notes of a single user and course, and return them with their ids.
+
+    This must run in the transaction that incremented their `NoteCounter`.
+    """
+    notes = Note.objects.bulk_create(notes)
+    if notes[0].pk is None:
+        # MySQL does not return the ids of inserted rows. The lock held on the counter row prevents
+        # any concurrent insert for this user and course, so they are the latest ids.
+        ids = list(
+            Note.objects.filter(user_id=notes[0].user_id, course_id=notes[0].course_id).order_by(
+                "-id"
+            ).values_list("id", flat=True)[:len(notes)]
+        )
+        for note, pk in zip(notes, reversed(ids)):
+            note.pk = pk
+    return notes
+
+
 class AnnotationDetailView(APIView):
     """
     **Use Case**
@@ -467,6 +944,14 @@ class AnnotationDetailView(APIView):
 
         * annotation_id: Annotation id
 
+    **Conditional Requests**
+
+        Responses of GET and PUT have an ETag header, which changes whenever the annotation is updated.
+
+        * If-None-Match: HTTP304 is returned to GET if the annotation has not changed.
+
+        * If-Match: HTTP412 is returned to PUT and DELETE if the annotation has changed.
+
     **Response Values for GET**
 
         * id: String. The primary key of the note.
@@ -498,6 +983,8 @@ class AnnotationDetailView(APIView):
         * HTTP_204_NO_CONTENT is returned
     """
 
+    renderer_classes = [NotesJSONRenderer]
+
     def get(self, *args, **kwargs):
         """
         Get an existing annotation.
@@ -505,12 +992,21 @@ class AnnotationDetailView(APIView):
         note_id = self.kwargs.get("annotation_id")
 
         try:
-            note = Note.objects.get(id=note_id)
+            with read_from_replica(self.request.query_params.get("user")):
+                if "If-None-Match" in self.request.headers:
+                    # Check the version of the note before fetching all of it.
+                    etag = note_etag(*Note.objects.values_list("id", "updated").get(id=note_id))
+                    not_modified = get_conditional_response(self.request, etag=etag)
+                    if not_modified is not None:
+                        not_modified.headers["ETag"] = etag
+                        return not_modified
+                note = Note.objects.values_list(*NOTE_ROW_FIELDS).get(id=note_id)
         except Note.DoesNotExist:
             return Response("Annotation not found!", status=status.HTTP_404_NOT_FOUND)
 
-        serializer = NoteSerializer(note)
-        return Response(serializer.data)
+        return Response(
+            serialize_note_row(note), headers={"ETag": note_etag(note[ROW_ID_INDEX], note[ROW_UPDATED_INDEX])}
+        )
 
     def put(self, *args, **kwargs):
         """
@@ -518,26 +1014,34 @@ class AnnotationDetailView(APIView):
         """
         note_id = self.kwargs.get("annotation_id")
 
-        try:
-            note = Note.objects.get(id=note_id)
-        except Note.DoesNotExist:
-            return Response(
-                "Annotation not found! No update performed.",
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        try:
-            note.text = self.request.data["text"]
-            note.tags = json.dumps(self.request.data["tags"])
-            note.full_clean()
-        except KeyError as error:
-            log.debug(error, exc_info=True)
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-
-        note.save()
+        with transaction.atomic():
+            # The note is locked, so that it does not change between the check of If-Match and the update.
+            try:
+                note = Note.objects.select_for_update().get(id=note_id)
+            except Note.DoesNotExist:
+                return Response(
+                    "Annotation not found! No update performed.",
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+
+            precondition_failed = get_conditional_response(self.request, etag=note_etag(note.id, note.updated))
+            if precondition_failed is not None:
+                return precondition_failed
+
+            try:
+                note.text = self.request.data["text"]
+                note.tags = self.request.data["tags"]
+                note.full_clean()
+            except KeyError as error:
+                log.debug(error, exc_info=True)
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+
+            note.save()
+        record_write(note.user_id)
+        response_cache.invalidate(note.user_id, note.course_id, [note.usage_id])
 
         serializer = NoteSerializer(note)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={"ETag": note_etag(note.id, note.updated)})
 
     def delete(self, *args, **kwargs):
         """
@@ -545,15 +1049,23 @@ class AnnotationDetailView(APIView):
         """
         note_id = self.kwargs.get("annotation_id")
 
-        try:
-            note = Note.objects.get(id=note_id)
-        except Note.DoesNotExist:
-            return Response(
-                "Annotation not found! No update performed.",
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        note.delete()
+        with transaction.atomic():
+            try:
+                note = Note.objects.select_for_update().get(id=note_id)
+            except Note.DoesNotExist:
+                return Response(
+                    "Annotation not found! No update performed.",
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+
+            precondition_failed = get_conditional_response(self.request, etag=note_etag(note.id, note.updated))
+            if precondition_failed is not None:
+                return precondition_failed
+
+            note.delete()
+            NoteCounter.decrement(note.user_id, note.course_id)
+        record_write(note.user_id)
+        response_cache.invalidate(note.user_id, note.course_id, [note.usage_id])
 
         # Annotation deleted successfully.
         return Response(status=status.HTTP_204_NO_CONTENT)
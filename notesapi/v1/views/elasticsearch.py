@@ -1,6 +1,8 @@
+import functools
 import logging
 import traceback
 
+from django.db import transaction
 from django_elasticsearch_dsl_drf.constants import (
     LOOKUP_FILTER_TERM,
     LOOKUP_QUERY_IN,
@@ -14,6 +16,8 @@ from elasticsearch.exceptions import TransportError
 from elasticsearch_dsl import Search
 from elasticsearch_dsl.connections import connections
 
+from notesapi.v1.models import Note
+from notesapi.v1.search_indexes import outbox
 from notesapi.v1.search_indexes.backends import (
     CompoundSearchFilterBackend,
     FilteringFilterBackend,
@@ -63,18 +67,21 @@ class AnnotationSearchView(BaseAnnotationSearchView):
         },
     }
 
-    def __init__(self, *args, **kwargs):
-        self.client = connections.get_connection(
-            NoteDocument._get_using()
-        )
-        self.index = NoteDocument._index._name
-        self.mapping = (
-            NoteDocument._doc_type.mapping.properties.name
-        )
-        self.search = Search(
-            using=self.client, index=self.index, doc_type=NoteDocument._doc_type.name
-        )
-        super().__init__(*args, **kwargs)
+    # Attributes of the document view sets of django_elasticsearch_dsl_drf, which some filter backends use.
+    index = NoteDocument._index._name  # pylint: disable=protected-access
+    mapping = NoteDocument._doc_type.mapping.properties.name  # pylint: disable=protected-access
+
+    @property
+    def client(self):
+        return get_note_search()._using  # pylint: disable=protected-access
+
+    @property
+    def search(self):
+        """
+        Search of the notes index, shared by all requests: views are instantiated on every request, and most of
+        them do not search in Elasticsearch.
+        """
+        return get_note_search()
 
     def get_serializer_class(self):
         """
@@ -112,6 +119,14 @@ class AnnotationSearchView(BaseAnnotationSearchView):
             return super().pagination_class
         return ESNotesPagination
 
+    @property
+    def is_response_cacheable(self):
+        """
+        The index is refreshed asynchronously: text search results could be cached before they include the latest
+        writes.
+        """
+        return super().is_response_cacheable and not self.is_text_search
+
     def build_query_params_state(self):
         super().build_query_params_state()
         if not self.is_text_search:
@@ -124,6 +139,51 @@ class AnnotationSearchView(BaseAnnotationSearchView):
         if "user" in self.params:
             self.query_params["user"] = self.query_params.pop("user_id")
 
+    @classmethod
+    def index_notes(cls, notes):
+        """
+        Record the notes in the outbox, in the current transaction, or index them once it is committed.
+        """
+        if outbox.is_enabled():
+            outbox.enqueue([note.pk for note in notes])
+        else:
+            transaction.on_commit(lambda: NoteDocument().update(notes))
+
+    @classmethod
+    def delete_notes(cls, note_ids):
+        """
+        Record the notes in the outbox, in the current transaction, or delete their documents once it is
+        committed.
+        """
+        if outbox.is_enabled():
+            outbox.enqueue(note_ids)
+        else:
+            # Documents that are already missing from the index are not errors.
+            transaction.on_commit(lambda: NoteDocument().update(
+                [Note(id=note_id) for note_id in note_ids], action="delete", raise_on_error=False
+            ))
+
+    @classmethod
+    def delete_user_notes(cls, user_id):
+        """
+        Delete all documents of a user with a delete-by-query, even when the outbox is enabled.
+
+        Outbox rows are keyed by note id, but the notes of the user are already deleted from the database,
+        and the query also removes documents that the database no longer has. The retirement request fails
+        if Elasticsearch does, and retirement callers retry it until it succeeds: the query is idempotent.
+        """
+        NoteDocument.search().filter("term", user=user_id).params(
+            conflicts="proceed", refresh=NoteDocument.django.auto_refresh
+        ).delete()
+
+    @classmethod
+    def get_indexed_note_ids(cls, batch_size=1000):
+        """
+        Scroll the ids of all documents. The scroll is a snapshot, so documents can be deleted meanwhile.
+        """
+        search = NoteDocument.search().source(False).params(size=batch_size)
+        return (int(hit.meta.id) for hit in search.scan())
+
     @classmethod
     def heartbeat(cls):
         if not get_es().ping():
@@ -139,3 +199,18 @@ class AnnotationSearchView(BaseAnnotationSearchView):
 
 def get_es():
     return connections.get_connection()
+
+
+@functools.cache
+def get_note_search():
+    """
+    Return the search of the notes index, built once per process.
+
+    `Search` methods return copies, so it can be shared. It is built on first use, once workers are forked.
+    """
+    # pylint: disable=protected-access
+    return Search(
+        using=connections.get_connection(NoteDocument._get_using()),
+        index=NoteDocument._index._name,
+        doc_type=NoteDocument._doc_type.name,
+    )
@@ -8,17 +8,30 @@ MEILISEARCH_ENABLED = True
 
 Then check the Client class for more information about Meilisearch credential settings.
 
+Create the index, or update its settings, before starting the service:
+
+    ./manage.py setup_meilisearch_index
+
 When you start using this backend, you might want to re-index all your content. To do that, run:
 
-    ./manage.py shell -c "from notesapi.v1.views.meilisearch import reindex; reindex()"
+    ./manage.py reindex_meilisearch
+
+After an outage of Meilisearch, synchronize the notes that changed since it started instead:
+
+    ./manage.py sync_search_index --since 2026-10-18T09:30:00Z
 """
 
+import os
+import threading
 import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import meilisearch
+from django import db
 from django.conf import settings
-from django.core.paginator import Paginator
-from django.db.models import signals
+from django.db import transaction
+from django.db.models import Max, Min, signals
 
 from notesapi.v1.models import Note
 
@@ -35,53 +48,105 @@ class Client:
     - MEILISEARCH_URL
     - MEILISEARCH_API_KEY
     - MEILISEARCH_INDEX
+
+    The client and the index are shared by all instances of a process. They are created on first use,
+    and again in forked processes, so that workers do not share the connections of their parent. The
+    index is checked once per process: run `./manage.py setup_meilisearch_index` when deploying to
+    create it or update its settings beforehand.
     """
 
     _CLIENT = None
     _INDEX = None
-    FILTERABLES = ["user_id", "course_id"]
+    _LOCK = threading.RLock()
+    FILTERABLES = ["user_id", "course_id", "updated"]
 
     @property
     def meilisearch_client(self) -> meilisearch.Client:
         """
         Return a meilisearch client.
         """
-        if self._CLIENT is None:
-            self._CLIENT = meilisearch.Client(
-                getattr(settings, "MEILISEARCH_URL", "http://meilisearch:7700"),
-                getattr(settings, "MEILISEARCH_API_KEY", ""),
-            )
-        return self._CLIENT
+        if Client._CLIENT is None:
+            with Client._LOCK:
+                if Client._CLIENT is None:
+                    Client._CLIENT = meilisearch.Client(
+                        getattr(settings, "MEILISEARCH_URL", "http://meilisearch:7700"),
+                        getattr(settings, "MEILISEARCH_API_KEY", ""),
+                    )
+        return Client._CLIENT
 
     @property
     def meilisearch_index(self) -> meilisearch.index.Index:
+        """
+        Return the meilisearch index used to store annotations, set up by `setup_index`.
+        """
+        if Client._INDEX is None:
+            with Client._LOCK:
+                if Client._INDEX is None:
+                    Client._INDEX = self.setup_index()
+        return Client._INDEX
+
+    def setup_index(self) -> meilisearch.index.Index:
         """
         Return the meilisearch index used to store annotations.
 
         If the index does not exist, it is created. And if it does not have the right
         filterable fields, then it is updated.
         """
-        if self._INDEX is None:
-            index_name = getattr(settings, "MEILISEARCH_INDEX", "student_notes")
-            try:
-                self._INDEX = self.meilisearch_client.get_index(index_name)
-            except meilisearch.errors.MeilisearchApiError:
-                task = self.meilisearch_client.create_index(
-                    index_name, {"primaryKey": "id"}
-                )
-                self.meilisearch_client.wait_for_task(task.task_uid, timeout_in_ms=2000)
-                self._INDEX = self.meilisearch_client.get_index(index_name)
+        index_name = getattr(settings, "MEILISEARCH_INDEX", "student_notes")
+        try:
+            index = self.meilisearch_client.get_index(index_name)
+        except meilisearch.errors.MeilisearchApiError:
+            task = self.meilisearch_client.create_index(
+                index_name, {"primaryKey": "id"}
+            )
+            self.meilisearch_client.wait_for_task(task.task_uid, timeout_in_ms=2000)
+            index = self.meilisearch_client.get_index(index_name)
+
+        # Checking filterable attributes
+        existing_filterables = set(index.get_filterable_attributes())
+        if not set(self.FILTERABLES).issubset(existing_filterables):
+            all_filterables = list(existing_filterables.union(self.FILTERABLES))
+            index.update_filterable_attributes(all_filterables)
 
-            # Checking filterable attributes
-            existing_filterables = set(self._INDEX.get_filterable_attributes())
-            if not set(self.FILTERABLES).issubset(existing_filterables):
-                all_filterables = list(existing_filterables.union(self.FILTERABLES))
-                self._INDEX.update_filterable_attributes(all_filterables)
+        return index
 
-        return self._INDEX
+    @classmethod
+    def reset(cls):
+        """
+        Forget the client and the index of the process, which are created again on next use.
+        """
+        cls._LOCK = threading.RLock()
+        cls._CLIENT = None
+        cls._INDEX = None
+
+
+os.register_at_fork(after_in_child=Client.reset)
+
+
+def quote_filter_value(value):
+    """
+    Return `value` as a quoted string of a Meilisearch filter, escaping its backslashes and quotes.
+    """
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
 
 
 class AnnotationSearchView(BaseAnnotationSearchView):
+    @property
+    def is_cursor_pagination(self):
+        """
+        Text search results are paginated by Meilisearch, with page numbers.
+        """
+        return super().is_cursor_pagination and not self.is_text_search
+
+    @property
+    def is_response_cacheable(self):
+        """
+        Documents are indexed asynchronously: text search results could be cached before they include the latest
+        writes.
+        """
+        return super().is_response_cacheable and not self.is_text_search
+
     def get_queryset(self):
         """
         Simple result filtering method based on test search.
@@ -96,8 +161,8 @@ class AnnotationSearchView(BaseAnnotationSearchView):
 
         # Define meilisearch params
         filters = [
-            f"user_id = '{self.params['user']}'",
-            f"course_id = '{self.params['course_id']}'",
+            f"user_id = {quote_filter_value(self.params['user'])}",
+            f"course_id = {quote_filter_value(self.params['course_id'])}",
         ]
         page_size = int(self.params["page_size"])
         offset = (int(self.params["page"]) - 1) * page_size
@@ -112,6 +177,55 @@ class AnnotationSearchView(BaseAnnotationSearchView):
         queryset = queryset.filter(id__in=[r["id"] for r in search_results["hits"]])
         return queryset
 
+    @classmethod
+    def index_notes(cls, notes):
+        """
+        Add or update documents, in a single request sent once the current transaction is committed.
+        """
+        def send():
+            task_uid = add_documents(notes)
+            if task_uid is not None:
+                recent_task_uids.append(task_uid)
+
+        transaction.on_commit(send)
+
+    @classmethod
+    def delete_notes(cls, note_ids):
+        """
+        Delete documents, in a single request sent once the current transaction is committed.
+        """
+        transaction.on_commit(
+            lambda: recent_task_uids.append(Client().meilisearch_index.delete_documents(note_ids).task_uid)
+        )
+
+    @classmethod
+    def delete_user_notes(cls, user_id):
+        """
+        Delete all documents of a user, in a single request.
+        """
+        recent_task_uids.append(
+            Client().meilisearch_index.delete_documents(filter=f"user_id = {quote_filter_value(user_id)}").task_uid
+        )
+
+    @classmethod
+    def get_indexed_note_ids(cls, batch_size=1000):
+        """
+        Return the ids of all documents, with one request per `batch_size` documents.
+
+        Documents are paginated by offset, so they are all listed before any of them is deleted.
+        """
+        index = Client().meilisearch_index
+        note_ids = []
+        while True:
+            documents = index.get_documents({
+                "fields": ["id"],
+                "offset": len(note_ids),
+                "limit": batch_size,
+            }).results
+            note_ids += [int(document.id) for document in documents]
+            if len(documents) < batch_size:
+                return note_ids
+
     @classmethod
     def heartbeat(cls):
         """
@@ -133,18 +247,56 @@ class AnnotationSearchView(BaseAnnotationSearchView):
             ) from e
 
 
+class PendingNotes(threading.local):
+    """
+    Ids of the notes changed by the transactions of a thread, whose documents are updated when they are committed.
+
+    Changes are buffered, so that a transaction updates all its documents with at most two requests, and
+    never updates them if it is rolled back. The ids of notes changed by transactions that were rolled
+    back are only flushed with the next transaction: the documents are built from the committed notes,
+    so this is harmless.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.note_ids = set()
+
+    def add(self, note_id):
+        self.note_ids.add(note_id)
+        # Errors of Meilisearch must not fail writes that were committed: they are logged.
+        transaction.on_commit(self.flush, robust=True)
+
+    def flush(self):
+        """
+        Update the documents of the pending notes, and return the uids of the Meilisearch tasks.
+        """
+        note_ids, self.note_ids = self.note_ids, set()
+        if not note_ids:
+            return []
+        return update_documents(note_ids)
+
+    def clear(self):
+        self.note_ids = set()
+
+
+pending_notes = PendingNotes()
+
+# Uids of the latest indexing tasks of the process, to check their status in Meilisearch.
+recent_task_uids = deque(maxlen=1000)
+
+
 def on_note_save(sender, instance, **kwargs):  # pylint: disable=unused-argument
     """
-    Create or update a document.
+    Create or update a document when the transaction is committed.
     """
-    add_documents([instance])
+    pending_notes.add(instance.id)
 
 
 def on_note_delete(sender, instance, **kwargs):  # pylint: disable=unused-argument
     """
-    Delete a document.
+    Delete a document when the transaction is committed.
     """
-    Client().meilisearch_index.delete_document(instance.id)
+    pending_notes.add(instance.id)
 
 
 def connect_signals() -> None:
@@ -166,19 +318,97 @@ def disconnect_signals() -> None:
 connect_signals()
 
 
-def reindex():
+def reindex(batch_size=1000, workers=1, after_id=0, on_progress=None):
+    """
+    Re-index the notes with ids greater than `after_id`, and return their number.
+
+    Notes are read by ranges of `batch_size` ids, without OFFSET, and each range is sent in a single
+    request by one of `workers` threads. `on_progress(count, last_id)` is called whenever all the notes
+    up to `last_id` were sent, `count` being the number of notes sent so far: re-indexing can be resumed
+    from `last_id`. See the `reindex_meilisearch` management command.
+    """
+    bounds = Note.objects.filter(id__gt=after_id).aggregate(first=Min("id"), last=Max("id"))
+    if bounds["first"] is None:
+        return 0
+    starts = range(bounds["first"], bounds["last"] + 1, batch_size)
+
+    total = 0
+    if workers <= 1:
+        for start in starts:
+            total += _index_range(start, start + batch_size)
+            if on_progress:
+                on_progress(total, min(start + batch_size - 1, bounds["last"]))
+        return total
+
+    # Ranges are completed out of order: progress is reported up to the first range that is not completed.
+    pending, completed = deque(), set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reindex") as executor:
+        futures = set()
+        starts = iter(starts)
+        while True:
+            for start in starts:
+                futures.add(executor.submit(_index_range_in_thread, start, start + batch_size))
+                pending.append(start)
+                if len(futures) >= 2 * workers:
+                    break
+            if not futures:
+                return total
+
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, count = future.result()
+                total += count
+                completed.add(start)
+            last_id = None
+            while pending and pending[0] in completed:
+                completed.remove(pending[0])
+                last_id = min(pending.popleft() + batch_size - 1, bounds["last"])
+            if on_progress and last_id is not None:
+                on_progress(total, last_id)
+
+
+def _index_range(start, stop):
+    """
+    Index the notes with ids in [start, stop), and return their number.
+    """
+    notes = Note.objects.filter(id__gte=start, id__lt=stop).only("id", "user_id", "course_id", "text", "updated")
+    notes = list(notes)
+    task_uid = add_documents(notes)
+    if task_uid is not None:
+        recent_task_uids.append(task_uid)
+    return len(notes)
+
+
+def _index_range_in_thread(start, stop):
+    try:
+        return start, _index_range(start, stop)
+    finally:
+        # Each thread has its own connection to the database.
+        db.connection.close()
+
+
+def update_documents(note_ids):
     """
-    Re-index all notes, in batches of 100.
+    Add or update the documents of the notes that exist, and delete the others, with at most two requests.
+
+    Return the uids of the Meilisearch tasks.
     """
-    paginator = Paginator(Note.objects.all(), 100)
-    for page_number in paginator.page_range:
-        page = paginator.page(page_number)
-        add_documents(page.object_list)
+    notes = Note.objects.in_bulk(note_ids)
+    task_uids = []
+    if notes:
+        task_uids.append(add_documents(notes.values()))
+    deleted_ids = sorted(set(note_ids) - set(notes))
+    if deleted_ids:
+        task_uids.append(Client().meilisearch_index.delete_documents(deleted_ids).task_uid)
+    recent_task_uids.extend(task_uids)
+    return task_uids
 
 
 def add_documents(notes):
     """
     Convert some Note objects and insert them in the index.
+
+    Return the uid of the Meilisearch task, or None if there are no notes.
     """
     documents_to_add = [
         {
@@ -186,8 +416,11 @@ def add_documents(notes):
             "user_id": note.user_id,
             "course_id": note.course_id,
             "text": note.text,
+            # Timestamp, so that documents can be filtered by date.
+            "updated": note.updated.timestamp(),
         }
         for note in notes
     ]
-    if documents_to_add:
-        Client().meilisearch_index.add_documents(documents_to_add)
+    if not documents_to_add:
+        return None
+    return Client().meilisearch_index.add_documents(documents_to_add).task_uid
@@ -24,6 +24,8 @@ ELASTICSEARCH_DSL_INDEX_SETTINGS = {'number_of_shards': 1, 'number_of_replicas':
 
 # Name of the Elasticsearch index
 ELASTICSEARCH_INDEX_NAMES = {'notesapi.v1.search_indexes.documents.note': 'edx_notes_api'}
+# Notes are indexed in requests. To index them in the background, with the process_index_outbox command, use
+# 'notesapi.v1.search_indexes.outbox.OutboxSignalProcessor'
 ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = 'django_elasticsearch_dsl.signals.RealTimeSignalProcessor'
 
 # Number of rows to return by default in result.
@@ -129,6 +131,9 @@ DEFAULT_NOTES_PAGE_SIZE = 25
 # Maximum number of allowed notes for each student per course
 MAX_NOTES_PER_COURSE = 500
 
+# Number of notes deleted per transaction when retiring a user
+RETIREMENT_NOTES_BATCH_SIZE = 500
+
 ELASTICSEARCH_URL = 'localhost:9200'
 ELASTICSEARCH_INDEX = 'edx_notes'
 
@@ -144,6 +149,42 @@ DATABASES = {
     }
 }
 
+DATABASE_ROUTERS = ['notesapi.v1.db_routers.ReadReplicaRouter']
+
+# Aliases of DATABASES that are read replicas of "default", used by the GET endpoints
+DATABASE_READ_REPLICAS = []
+
+# Seconds after a write of a user during which their reads stay on "default", 0 to disable
+DATABASE_READ_YOUR_WRITES_SECONDS = 0
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'notes',
+    }
+}
+
+# Alias in CACHES of the cache of the notes, which must be shared by all processes in production
+NOTES_CACHE = 'default'
+
+# Number of entries of the notes cache kept by each process
+NOTES_LOCAL_CACHE_SIZE = 1000
+
+# Timeout in seconds of the cache of the responses of the annotation list and search endpoints, 0 to disable it
+NOTES_RESPONSE_CACHE_TIMEOUT = 0
+
+# Timeout in seconds of the cache of the rendered responses of usage id searches, 0 to disable it
+NOTES_USAGE_SEARCH_CACHE_TIMEOUT = 0
+
+# Timeout in seconds of the cache of the numbers of notes of paginated responses, 0 to disable it
+NOTES_COUNT_CACHE_TIMEOUT = 0
+
+# Timeout in seconds of the cache of the users who have notes in a course, 0 to disable it
+NOTES_MEMBERSHIP_CACHE_TIMEOUT = 0
+
+# Number of validated access tokens kept by each process until they expire, 0 to disable
+VALIDATED_TOKEN_CACHE_SIZE = 1024
+
 USERNAME_REPLACEMENT_WORKER = 'OVERRIDE THIS WITH A VALID USERNAME'
 
 JWT_AUTH = {
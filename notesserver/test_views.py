@@ -8,6 +8,8 @@ from django.urls import reverse
 from elasticsearch.exceptions import TransportError
 from rest_framework.test import APITestCase
 
+from notesapi.v1.permissions import validated_tokens
+
 
 class OperationalEndpointsTest(APITestCase):
     """
@@ -72,6 +74,7 @@ class OperationalEndpointsTest(APITestCase):
         """
         mocked_datetime.datetime.now.return_value = datetime.datetime(2014, 12, 11)
         mocked_get_es.return_value.info.return_value = {}
+        validated_tokens.clear()
         response = self.client.get(reverse('selftest'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(
@@ -90,8 +93,13 @@ class OperationalEndpointsTest(APITestCase):
         Test returned data on success.
         """
         mocked_datetime.datetime.now.return_value = datetime.datetime(2014, 12, 11)
-        response = self.client.get(reverse('selftest'))
+        validated_tokens.clear()
+        with self.assertLogs("notesserver.views", level="INFO") as logs:
+            response = self.client.get(reverse('selftest'))
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(logs.output, [
+            "INFO:notesserver.views:Validated token cache: {'hits': 0, 'misses': 0, 'size': 0}",
+        ])
         self.assertEqual(
             response.data,
             {
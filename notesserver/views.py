@@ -1,4 +1,5 @@
 import datetime
+import logging
 import traceback
 
 from django.db import connection
@@ -10,9 +11,12 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
+from notesapi.v1.permissions import validated_tokens
 from notesapi.v1.views import get_annotation_search_view_class
 from notesapi.v1.views import SearchViewRuntimeError
 
+log = logging.getLogger(__name__)
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -81,6 +85,9 @@ def selftest(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    # The endpoint is not authenticated: the counters of the token cache are logged, not returned.
+    log.info("Validated token cache: %s", validated_tokens.stats())
+
     end = datetime.datetime.now()
     delta = end - start
     response["time_elapsed"] = int(delta.total_seconds() * 1000)  # In milliseconds.